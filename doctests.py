@@ -9,7 +9,21 @@ import mock
 MODULES_WITH_DOCTESTS = [
     "kivy_grid_cells.widgets",
     "kivy_p2life.widgets",
+    "kivy_p2life.events",
+    "kivy_p2life.rendering",
+    "kivy_p2life.patterns",
     "kivy_p2life.gol",
+    "kivy_p2life.rules",
+    "kivy_p2life.batch",
+    "kivy_p2life.buffered",
+    "kivy_p2life.bitboard",
+    "kivy_p2life.hashlife",
+    "kivy_p2life.jit",
+    "kivy_p2life.tiled",
+    "kivy_p2life.unbounded",
+    "kivy_p2life.parallel",
+    "kivy_p2life.engines",
+    "kivy_p2life.worker",
     "main",
 ]
 
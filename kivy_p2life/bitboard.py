@@ -0,0 +1,291 @@
+"""Bit-packed P2Life engine
+
+The board is held as two bit planes (one for white cells, one for black
+cells), with each row packed into 64-bit words. Neighbour counts are
+calculated with word-wide bitwise adders, so each operation processes 64
+cells at once.
+"""
+
+import numpy as np
+
+from .constants import Colours
+from .gol import TieBreak
+
+WORD_BITS = 64
+
+_ONE = np.uint64(1)
+_TOP_BIT = np.uint64(WORD_BITS - 1)
+_SHIFTS = np.arange(WORD_BITS, dtype=np.uint64)
+
+
+def _num_words(cols):
+    return -(-cols // WORD_BITS)
+
+
+def pack(mask):
+    """Pack a two-dimensional boolean array into rows of 64-bit words
+
+    Bit ``n`` of word ``w`` holds column ``w * 64 + n``. Padding bits past
+    the last column are always zero.
+
+    >>> pack(np.array([[True, False, True], [False, True, False]]))
+    array([[5],
+           [2]], dtype=uint64)
+    """
+    mask = np.asarray(mask, dtype=bool)
+    assert mask.ndim == 2
+    rows, cols = mask.shape
+    nwords = _num_words(cols)
+    bits = np.zeros((rows, nwords * WORD_BITS), dtype=np.uint64)
+    bits[:, :cols] = mask
+    bits = bits.reshape(rows, nwords, WORD_BITS) << _SHIFTS
+    return np.bitwise_or.reduce(bits, axis=2)
+
+
+def unpack(plane, cols):
+    """Unpack a plane created by :func:`pack` back into a boolean array
+
+    >>> unpack(pack([[True, False, True]]), 3).tolist()
+    [[True, False, True]]
+    """
+    bits = (plane[:, :, np.newaxis] >> _SHIFTS) & _ONE
+    return bits.reshape(plane.shape[0], -1)[:, :cols].astype(bool)
+
+
+def _valid_mask(cols):
+    """Word mask with a bit set for every real (non-padding) column"""
+    mask = np.empty(_num_words(cols), dtype=np.uint64)
+    mask.fill(np.iinfo(np.uint64).max)
+    remainder = cols % WORD_BITS
+    if remainder:
+        mask[-1] = (_ONE << np.uint64(remainder)) - _ONE
+    return mask
+
+
+def _shift_east(plane, cols):
+    """Give every cell the value of its eastern (column + 1) neighbour"""
+    out = plane >> _ONE
+    out[:, :-1] |= plane[:, 1:] << _TOP_BIT
+    # Wrap: the last column takes the value of the first
+    last_word, last_bit = divmod(cols - 1, WORD_BITS)
+    out[:, last_word] |= (plane[:, 0] & _ONE) << np.uint64(last_bit)
+    return out
+
+
+def _shift_west(plane, cols, valid):
+    """Give every cell the value of its western (column - 1) neighbour"""
+    out = plane << _ONE
+    out[:, 1:] |= plane[:, :-1] >> _TOP_BIT
+    out &= valid
+    # Wrap: the first column takes the value of the last
+    last_word, last_bit = divmod(cols - 1, WORD_BITS)
+    out[:, 0] |= (plane[:, last_word] >> np.uint64(last_bit)) & _ONE
+    return out
+
+
+def _full_add(a, b, c):
+    """Bitwise full adder; returns (sum, carry)"""
+    partial = a ^ b
+    return partial ^ c, (a & b) | (partial & c)
+
+
+def neighbour_count(plane, cols, valid=None):
+    """Count the live neighbours of every cell in a plane
+
+    Returns the count as four bit planes, least significant first.
+
+    >>> plane = pack([[True, True, True], [False, False, False],
+    ...               [False, False, False], [False, False, False]])
+    >>> bits = neighbour_count(plane, 3)
+    >>> sum(unpack(b, 3).astype(int) << i for i, b in enumerate(bits))
+    array([[2, 2, 2],
+           [3, 3, 3],
+           [0, 0, 0],
+           [3, 3, 3]])
+    """
+    if valid is None:
+        valid = _valid_mask(cols)
+    east = _shift_east(plane, cols)
+    west = _shift_west(plane, cols, valid)
+    # Sum each row of three, and the two horizontal neighbours
+    row_sum, row_carry = _full_add(west, plane, east)
+    pair_sum, pair_carry = west ^ east, west & east
+    # Add the rows above and below to the horizontal neighbours
+    bit0, carry1 = _full_add(np.roll(row_sum, 1, 0), np.roll(row_sum, -1, 0),
+                             pair_sum)
+    twos, fours = _full_add(np.roll(row_carry, 1, 0),
+                            np.roll(row_carry, -1, 0), pair_carry)
+    bit1 = twos ^ carry1
+    carry2 = twos & carry1
+    return bit0, bit1, fours ^ carry2, fours & carry2
+
+
+def _equals(bits, value):
+    """Mask of cells where the bit-sliced number equals ``value``"""
+    result = None
+    for i, bit in enumerate(bits):
+        term = bit if (value >> i) & 1 else ~bit
+        result = term if result is None else result & term
+    return result
+
+
+def _difference(a_bits, b_bits):
+    """Bit-sliced ``a - b`` as a five-bit two's complement number"""
+    zeros = np.zeros_like(a_bits[0])
+    carry = ~zeros
+    out = []
+    for a, b in zip(a_bits + (zeros, ), b_bits + (zeros, )):
+        total, carry = _full_add(a, ~b, carry)
+        out.append(total)
+    return tuple(out)
+
+
+def _coin(contested, cols, random_state):
+    """Plane with a bit set where a B/W birth should be white"""
+    if isinstance(random_state, TieBreak):
+        positions = np.nonzero(unpack(contested, cols))
+        white = np.zeros((contested.shape[0], cols), dtype=bool)
+        white[positions] = random_state.choose(positions) == Colours.WHITE
+        return pack(white)
+    if random_state is None:
+        random_state = np.random
+    return np.frombuffer(random_state.bytes(contested.size * 8),
+                         dtype=np.uint64).reshape(contested.shape)
+
+
+def step_planes(white, black, cols, random_state=None):
+    """Evolve a pair of packed planes by one P2Life generation
+
+    The rules are the same as :func:`kivy_p2life.gol.p2life_step`.
+
+    Parameters
+    ----------
+    white, black : ndarray
+        uint64 planes, as returned by :func:`pack`
+    cols : int
+        the number of columns on the board
+    random_state : RandomState or TieBreak, optional
+        source of the B/W birth tie-breaks
+
+    Returns
+    -------
+    (white, black) : tuple
+        the planes for the next generation
+    """
+    valid = _valid_mask(cols)
+    white_nbrs = neighbour_count(white, cols, valid)
+    black_nbrs = neighbour_count(black, cols, valid)
+
+    # Birth: exactly three neighbours of one colour, and not exactly three
+    # of the other.
+    empties = ~(white | black) & valid
+    white_three = _equals(white_nbrs, 3)
+    black_three = _equals(black_nbrs, 3)
+    white_birth = empties & white_three & ~black_three
+    black_birth = empties & black_three & ~white_three
+
+    # B/W birth: exactly three white and three black neighbours.
+    contested = empties & white_three & black_three
+    if contested.any():
+        coin = _coin(contested, cols, random_state)
+        white_birth |= contested & coin
+        black_birth |= contested & ~coin
+    if isinstance(random_state, TieBreak):
+        random_state.generation += 1
+
+    # Survival: the difference between white and black neighbours is two or
+    # three, or it is one and the larger colour count is at least two (ie.
+    # the smaller count is non-zero).
+    diff = _difference(white_nbrs, black_nbrs)
+    survival = (_equals(diff, 2) | _equals(diff, 3) |
+                _equals(diff, -2 & 31) | _equals(diff, -3 & 31))
+    survival |= _equals(diff, 1) & ~_equals(black_nbrs, 0)
+    survival |= _equals(diff, -1 & 31) & ~_equals(white_nbrs, 0)
+
+    return white_birth | (white & survival), black_birth | (black & survival)
+
+
+class BitBoard(object):
+
+    """A P2Life board stored as two packed bit planes"""
+
+    def __init__(self, white, black, cols, random_state=None):
+        self.white = white
+        self.black = black
+        self.cols = cols
+        self.random_state = random_state
+
+    @classmethod
+    def from_array(cls, X, random_state=None):
+        """Create a BitBoard from a dense board
+
+        >>> board = BitBoard.from_array(np.array([[1, 0, 2]]))
+        >>> board.white, board.black
+        (array([[1]], dtype=uint64), array([[4]], dtype=uint64))
+        """
+        X = np.asarray(X)
+        assert X.ndim == 2
+        return cls(pack(X == Colours.WHITE), pack(X == Colours.BLACK),
+                   X.shape[1], random_state)
+
+    @property
+    def shape(self):
+        return (self.white.shape[0], self.cols)
+
+    def to_array(self):
+        """Unpack into a dense board of Colours values
+
+        >>> BitBoard.from_array([[1, 0, 2]]).to_array()
+        array([[1, 0, 2]])
+        """
+        return (unpack(self.white, self.cols) * Colours.WHITE +
+                unpack(self.black, self.cols) * Colours.BLACK)
+
+    def step(self):
+        self.white, self.black = step_planes(self.white, self.black,
+                                             self.cols, self.random_state)
+
+
+def bitboard_step(X, random_state=None):
+    """P2Life step using the bit-packed engine
+
+    :param random_state: RandomState or TieBreak used for B/W births
+
+    Simple evolution:
+
+    >>> bitboard_step(np.array([[1, 2, 1], [1, 2, 1], [1, 2, 1]]))
+    array([[1, 0, 1],
+           [1, 0, 1],
+           [1, 0, 1]])
+    """
+    board = BitBoard.from_array(X, random_state)
+    board.step()
+    return board.to_array()
+
+
+def bitboard_animation(X, random_state=None):
+    """Produce a P2Life animation, keeping the board packed between frames
+
+    Parameters
+    ----------
+    X : array_like
+        a two-dimensional numpy array showing the game board
+    random_state : RandomState or TieBreak, optional
+        source of the B/W birth tie-breaks
+
+    >>> gen = bitboard_animation(np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]))
+    >>> gen.next()
+    array([[0, 0, 0, 0, 0],
+           [0, 0, 1, 0, 0],
+           [0, 0, 1, 0, 0],
+           [0, 0, 1, 0, 0],
+           [0, 0, 0, 0, 0]])
+    """
+    board = BitBoard.from_array(X, random_state)
+
+    def _iterate(board):
+        while True:
+            board.step()
+            yield board.to_array()
+
+    return _iterate(board)
@@ -0,0 +1,185 @@
+"""Allocation-free P2Life engine
+
+:class:`BufferedStepper` owns every array a generation needs: two boards,
+which it alternates between, and scratch space for the colour planes,
+neighbour counts and rule masks. Neighbour counts are small integers built
+from separable, wrapping shifted sums, so no float temporaries are created
+and nothing full-size is allocated after the first step. The results are the
+same as :func:`kivy_p2life.gol.p2life_step`.
+"""
+
+import numpy as np
+
+from .constants import Colours
+from .gol import TieBreak, resolve_births
+
+_COUNT_DTYPE = np.int8
+
+
+def _wrap_sum(src, out, axis):
+    """Set out to the sum of each cell and its two neighbours along an axis,
+    wrapping around the edges; out must not share memory with src
+
+    >>> out = np.zeros((1, 4), dtype=int)
+    >>> _wrap_sum(np.array([[1, 0, 0, 2]]), out, axis=1)
+    >>> out
+    array([[3, 1, 2, 3]])
+    """
+    src = np.swapaxes(src, 0, axis)
+    out = np.swapaxes(out, 0, axis)
+    length = len(src)
+    np.add(src[:-2], src[1:-1], out=out[1:-1])
+    np.add(out[1:-1], src[2:], out=out[1:-1])
+    for index in set([0, length - 1]):
+        np.add(src[(index - 1) % length], src[index], out=out[index])
+        np.add(out[index], src[(index + 1) % length], out=out[index])
+
+
+class BufferedStepper(object):
+
+    """A P2Life step function which reuses its buffers between generations
+
+    The board returned by a step is one of the stepper's own buffers. It is
+    overwritten by the step after next, so copy it if it needs to be kept.
+    Passing the returned board back in continues from it without copying.
+
+    Parameters
+    ----------
+    random_state : RandomState or TieBreak, optional
+        source of the B/W birth tie-breaks
+
+    >>> stepper = BufferedStepper()
+    >>> X = stepper(np.array([[1, 2, 1], [1, 2, 1], [1, 2, 1]]))
+    >>> X
+    array([[1, 0, 1],
+           [1, 0, 1],
+           [1, 0, 1]])
+    >>> stepper(X) is stepper.board
+    True
+    """
+
+    def __init__(self, random_state=None):
+        self.random_state = random_state
+        self._shape = None
+        self._boards = None
+        self._parity = 0
+
+    @property
+    def board(self):
+        """The current generation"""
+        return self._boards[self._parity]
+
+    def _allocate(self, shape):
+        self._boards = (np.zeros(shape, dtype=int), np.zeros(shape, dtype=int))
+        self._whites = np.zeros(shape, dtype=_COUNT_DTYPE)
+        self._blacks = np.zeros(shape, dtype=_COUNT_DTYPE)
+        self._scratch = np.zeros(shape, dtype=_COUNT_DTYPE)
+        self._white_nbrs = np.zeros(shape, dtype=_COUNT_DTYPE)
+        self._black_nbrs = np.zeros(shape, dtype=_COUNT_DTYPE)
+        self._diff = np.zeros(shape, dtype=_COUNT_DTYPE)
+        self._masks = np.zeros((4,) + shape, dtype=bool)
+        self._shape = shape
+
+    def load(self, X):
+        """Copy a board into the current buffer"""
+        X = np.asarray(X)
+        assert X.ndim == 2
+        if X.shape != self._shape:
+            self._allocate(X.shape)
+        self.board[...] = X
+
+    def _count(self, plane, out):
+        _wrap_sum(plane, self._scratch, axis=0)
+        _wrap_sum(self._scratch, out, axis=1)
+        np.subtract(out, plane, out=out)
+
+    def step(self):
+        """Evolve the current board by one generation, and return it
+
+        >>> stepper = BufferedStepper()
+        >>> stepper.load(np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 2, 2, 2, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]))
+        >>> stepper.step()[1:4, 1:4]
+        array([[0, 2, 0],
+               [0, 2, 0],
+               [0, 2, 0]])
+        """
+        board = self.board
+        new = self._boards[1 - self._parity]
+        empty, white_birth, black_birth, scratch = self._masks
+        white_nbrs, black_nbrs = self._white_nbrs, self._black_nbrs
+
+        np.equal(board, Colours.WHITE, out=scratch)
+        self._whites[...] = scratch
+        np.equal(board, Colours.BLACK, out=scratch)
+        self._blacks[...] = scratch
+        self._count(self._whites, white_nbrs)
+        self._count(self._blacks, black_nbrs)
+
+        # Birth: exactly three neighbours of one colour; with three of each,
+        # the cell becomes Colours.UNKNOWN until the tie-break
+        np.equal(board, Colours.EMPTY, out=empty)
+        np.equal(white_nbrs, 3, out=white_birth)
+        np.logical_and(white_birth, empty, out=white_birth)
+        np.equal(black_nbrs, 3, out=black_birth)
+        np.logical_and(black_birth, empty, out=black_birth)
+        np.multiply(white_birth, Colours.WHITE, out=new)
+        np.add(new, Colours.BLACK, out=new, where=black_birth)
+        np.logical_and(white_birth, black_birth, out=scratch)
+        if scratch.any():
+            resolve_births(new, self.random_state)
+        elif isinstance(self.random_state, TieBreak):
+            self.random_state.generation += 1
+
+        # Survival: the neighbour difference is two or three, or it is one
+        # and the cell has at least two neighbours of the majority colour
+        diff = self._diff
+        np.subtract(white_nbrs, black_nbrs, out=diff)
+        np.abs(diff, out=diff)
+        survival, majority = white_birth, black_birth
+        np.greater_equal(diff, 2, out=survival)
+        np.less_equal(diff, 3, out=scratch)
+        np.logical_and(survival, scratch, out=survival)
+        np.maximum(white_nbrs, black_nbrs, out=self._scratch)
+        np.greater_equal(self._scratch, 2, out=majority)
+        np.equal(diff, 1, out=scratch)
+        np.logical_and(majority, scratch, out=majority)
+        np.logical_or(survival, majority, out=survival)
+        # Empty cells add nothing, so births are left alone
+        np.add(new, board, out=new, where=survival)
+
+        self._parity = 1 - self._parity
+        return new
+
+    def advance(self, X, generations):
+        """Evolve the board by several generations, returning only the last"""
+        if self._boards is None or X is not self.board:
+            self.load(X)
+        for unused in range(generations):
+            self.step()
+        return self.board
+
+    def __call__(self, X):
+        if self._boards is None or X is not self.board:
+            self.load(X)
+        return self.step()
+
+
+def buffered_animation(X, random_state=None):
+    """Produce a P2Life animation using the allocation-free engine
+
+    Each yielded board is a copy, so it stays valid.
+
+    >>> gen = buffered_animation(np.array([[1, 2, 1], [1, 2, 1], [1, 2, 1]]))
+    >>> gen.next()
+    array([[1, 0, 1],
+           [1, 0, 1],
+           [1, 0, 1]])
+    """
+    stepper = BufferedStepper(random_state)
+    stepper.load(X)
+
+    def _iterate(stepper):
+        while True:
+            yield stepper.step().copy()
+
+    return _iterate(stepper)
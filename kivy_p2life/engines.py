@@ -0,0 +1,419 @@
+"""Registry of P2Life step backends
+
+Every engine is a callable with the same signature as
+:func:`kivy_p2life.gol.p2life_step`, so it can be passed as the ``step``
+argument of :func:`kivy_p2life.gol.life_animation`. Stateful engines carry
+their state over from one call to the next as long as they're given back the
+board they last returned.
+
+Engines which take a ``random_state`` accept a numpy RandomState or a
+:class:`kivy_p2life.gol.TieBreak` for the B/W birth tie-break.
+
+Most engines wrap around the board's edges; see :func:`create_engine` for
+the others.
+"""
+
+from collections import OrderedDict
+from timeit import default_timer
+
+import numpy as np
+
+from . import gol, jit
+from .bitboard import BitBoard
+from .buffered import BufferedStepper
+from .constants import Colours
+from .hashlife import HashLife
+from .parallel import ParallelStepper
+from .rules import P2LIFE
+from .tiled import TiledBoard
+from .unbounded import UnboundedBoard
+
+AUTO = "auto"
+
+ENGINES = OrderedDict()
+
+
+def register_engine(cls):
+    """Class decorator which adds an engine to ENGINES"""
+    ENGINES[cls.name] = cls
+    return cls
+
+
+class Engine(object):
+
+    """Base class for step backends"""
+
+    name = NotImplemented
+    # Whether autotune() should consider this engine, and the smallest board
+    # (in cells) it should be considered for
+    autotune = True
+    autotune_min_cells = 0
+    boundary = gol.WRAP
+
+    def __init__(self, random_state=None):
+        self.random_state = random_state
+        # Each colour's (births, deaths) during the last call
+        self.deltas = None
+
+    def __call__(self, X):
+        return self.advance(X, 1)
+
+    def __repr__(self):
+        return "<{} engine>".format(self.name)
+
+    def step(self, X):
+        """Evolve the board by one generation; engines which can count
+        births and deaths as they go add them to ``self.deltas``"""
+        raise NotImplementedError
+
+    def advance(self, X, generations):
+        """Evolve the board by several generations, returning only the last
+
+        Afterwards, ``deltas`` holds each colour's births and deaths, so a
+        running population count can be kept without scanning the board.
+        Only engines whose step() counts them as it goes (P2LifeEngine) get
+        them for free; the others compare the old and new boards instead.
+
+        >>> engine = P2LifeEngine()
+        >>> engine.advance([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]], 3)[1:4, 1:4]
+        array([[0, 1, 0],
+               [0, 1, 0],
+               [0, 1, 0]])
+        >>> engine.deltas[Colours.WHITE]
+        (6, 6)
+        """
+        self.deltas = {}
+        new = self._advance(X, generations)
+        if not self.deltas:
+            gol.births_and_deaths(np.asarray(X), new, self.deltas)
+        return new
+
+    def _advance(self, X, generations):
+        X = np.asarray(X).astype(int)
+        for unused in range(generations):
+            X = self.step(X)
+        return X
+
+    def reset(self):
+        """Forget any state carried over from earlier calls"""
+
+    def close(self):
+        """Release any resources held by the engine"""
+
+
+class StatefulEngine(Engine):
+
+    """Engine which keeps its own representation of the board
+
+    Subclasses implement ``load(X)``, ``evolve(generations)`` and
+    ``unload()``. The board is only loaded again if it differs from the last
+    one returned, so changes made to that board (eg. pieces placed on it)
+    are never lost.
+
+    >>> engine = BitBoardEngine()
+    >>> X = engine.advance(np.zeros((4, 4), dtype=int), 1)
+    >>> X[1, 0:3] = Colours.WHITE
+    >>> engine.advance(X, 1)[0:3, 1]
+    array([1, 1, 1])
+    """
+
+    def __init__(self, random_state=None):
+        super(StatefulEngine, self).__init__(random_state)
+        # A copy of the last board returned, which the caller may change
+        self._last = None
+
+    def step(self, X):
+        return self.advance(X, 1)
+
+    def reset(self):
+        self._last = None
+
+    def _advance(self, X, generations):
+        X = np.asarray(X)
+        if self._last is None or not np.array_equal(X, self._last):
+            self.load(X)
+        self.evolve(generations)
+        new = self.unload()
+        self._last = np.array(new)
+        return new
+
+
+@register_engine
+class P2LifeEngine(Engine):
+
+    """Dense scipy engine; see :func:`kivy_p2life.gol.p2life_step`"""
+
+    name = "p2life"
+
+    def __init__(self, random_state=None, boundary=gol.WRAP):
+        super(P2LifeEngine, self).__init__(random_state)
+        self.boundary = boundary
+
+    def step(self, X):
+        return gol.p2life_step(X, self.random_state, self.boundary,
+                               self.deltas)
+
+
+@register_engine
+class LookupTableEngine(Engine):
+
+    """Compiled rule table; see :mod:`kivy_p2life.rules`"""
+
+    name = "lut"
+
+    def __init__(self, rule=P2LIFE, random_state=None):
+        super(LookupTableEngine, self).__init__(random_state)
+        self.rule = rule
+
+    def step(self, X):
+        return self.rule.step(X, self.random_state)
+
+
+@register_engine
+class BufferedEngine(StatefulEngine):
+
+    """Allocation-free engine; see :mod:`kivy_p2life.buffered`"""
+
+    name = "buffered"
+
+    def __init__(self, random_state=None):
+        super(BufferedEngine, self).__init__(random_state)
+        self.stepper = BufferedStepper(random_state)
+
+    def load(self, X):
+        self.stepper.load(X)
+
+    def evolve(self, generations):
+        for unused in range(generations):
+            self.stepper.step()
+
+    def unload(self):
+        # The stepper's buffers are reused, so hand out a copy
+        return self.stepper.board.copy()
+
+
+@register_engine
+class JITEngine(BufferedEngine):
+
+    """Compiled fused-loop engine; see :mod:`kivy_p2life.jit`"""
+
+    name = "jit"
+    # Without Numba, this is just the dense engine
+    autotune = jit.AVAILABLE
+
+    def __init__(self, random_state=None, threads=True):
+        super(JITEngine, self).__init__(random_state)
+        self.stepper = jit.JITStepper(random_state, threads)
+
+
+@register_engine
+class BitBoardEngine(StatefulEngine):
+
+    """Bit-packed engine; see :mod:`kivy_p2life.bitboard`"""
+
+    name = "bitboard"
+
+    def load(self, X):
+        self.board = BitBoard.from_array(X, self.random_state)
+
+    def evolve(self, generations):
+        for unused in range(generations):
+            self.board.step()
+
+    def unload(self):
+        return self.board.to_array()
+
+
+@register_engine
+class TiledEngine(StatefulEngine):
+
+    """Active-tile engine; see :mod:`kivy_p2life.tiled`"""
+
+    name = "tiled"
+
+    def __init__(self, tile_size=16, random_state=None):
+        super(TiledEngine, self).__init__(random_state)
+        self.tile_size = tile_size
+
+    def load(self, X):
+        self.board = TiledBoard(X, self.tile_size, self.random_state)
+
+    def evolve(self, generations):
+        for unused in range(generations):
+            self.board.step()
+
+    def unload(self):
+        return self.board.cells.copy()
+
+
+@register_engine
+class HashLifeEngine(StatefulEngine):
+
+    """Quadtree engine; see :mod:`kivy_p2life.hashlife`"""
+
+    name = "hashlife"
+    # Single generations are slow; this engine pays off on long jumps
+    autotune = False
+
+    def __init__(self, seed=0):
+        super(HashLifeEngine, self).__init__()
+        self.hashlife = HashLife(seed=seed)
+
+    def load(self, X):
+        self.hashlife.load(X)
+
+    def evolve(self, generations):
+        self.hashlife.evolve(generations)
+
+    def unload(self):
+        return self.hashlife.board
+
+
+@register_engine
+class UnboundedEngine(StatefulEngine):
+
+    """Engine for an edgeless board; see :mod:`kivy_p2life.unbounded`
+
+    The boards it is given and returns are a window onto the unbounded
+    board at ``origin``, so cells which leave the window carry on evolving
+    and can come back.
+
+    >>> engine = UnboundedEngine(chunk=4)
+    >>> X = engine(np.array([[0, 0, 0], [0, 0, 0], [1, 1, 1]]))
+    >>> X
+    array([[0, 0, 0],
+           [0, 1, 0],
+           [0, 1, 0]])
+    >>> engine(X)
+    array([[0, 0, 0],
+           [0, 0, 0],
+           [1, 1, 1]])
+    """
+
+    name = "unbounded"
+    autotune = False
+    boundary = gol.UNBOUNDED
+
+    def __init__(self, chunk=16, random_state=None):
+        super(UnboundedEngine, self).__init__(random_state)
+        self.chunk = chunk
+        self.origin = (0, 0)
+        self.board = None
+        self._shape = None
+
+    def reset(self):
+        super(UnboundedEngine, self).reset()
+        self.board = None
+
+    def load(self, X):
+        if self.board is None:
+            self.board = UnboundedBoard(chunk=self.chunk,
+                                        random_state=self.random_state)
+        # Anything outside the window is kept
+        self.board.paste(X, self.origin)
+        self._shape = X.shape
+
+    def evolve(self, generations):
+        for unused in range(generations):
+            self.board.step()
+
+    def unload(self):
+        return self.board.window(self.origin, self._shape)
+
+
+@register_engine
+class ParallelEngine(Engine):
+
+    """Multi-core engine; see :mod:`kivy_p2life.parallel`"""
+
+    name = "parallel"
+    # Starting the worker processes costs more than they save on small
+    # boards, so don't start them just to be timed
+    autotune_min_cells = 512 * 512
+
+    def __init__(self, processes=None, seed=None, hashed=False):
+        super(ParallelEngine, self).__init__()
+        self.stepper = ParallelStepper(processes, seed, hashed)
+
+    def step(self, X):
+        return self.stepper(X)
+
+    def _advance(self, X, generations):
+        return self.stepper.advance(X, generations)
+
+    def close(self):
+        self.stepper.close()
+
+
+def _autotune_candidates(rows, cols):
+    return [name for name, cls in ENGINES.items()
+            if cls.autotune and rows * cols >= cls.autotune_min_cells]
+
+
+def autotune(rows, cols, generations=5, names=None):
+    """Time each engine on a board of the given size and return the fastest
+
+    Engines which are already slower than the best so far are abandoned
+    early, so a slow backend can't hold up startup. By default, all engines
+    with ``autotune = True`` are tried, unless the board has fewer than
+    their ``autotune_min_cells``.
+
+    >>> engine = autotune(8, 8, names=["p2life", "bitboard"])
+    >>> engine.name in ("p2life", "bitboard")
+    True
+    >>> "parallel" in _autotune_candidates(30, 30)
+    False
+    """
+    if names is None:
+        names = _autotune_candidates(rows, cols)
+    board = np.random.choice(
+        [Colours.EMPTY, Colours.EMPTY, Colours.WHITE, Colours.BLACK],
+        size=(rows, cols))
+    best, best_time = None, None
+    for name in names:
+        engine = ENGINES[name]()
+        X = engine(board)  # Warm up
+        elapsed = 0
+        for unused in range(generations):
+            start = default_timer()
+            X = engine(X)
+            elapsed += default_timer() - start
+            if best_time is not None and elapsed > best_time:
+                break
+        else:
+            if best is not None:
+                best.close()
+            best, best_time = engine, elapsed
+            continue
+        engine.close()
+    return best
+
+
+def create_engine(name, rows, cols, boundary=gol.WRAP):
+    """Create an engine by name, or the fastest engine for the board size if
+    name is "auto"
+
+    Only wrapping boards have a choice of engine; dead edges use the dense
+    engine and unbounded boards use UnboundedEngine, whatever the name.
+
+    >>> create_engine("bitboard", 30, 30)
+    <bitboard engine>
+    >>> create_engine("bitboard", 30, 30, boundary=gol.UNBOUNDED)
+    <unbounded engine>
+    >>> create_engine("warp-drive", 30, 30)
+    Traceback (most recent call last):
+    KeyError: 'Unknown engine warp-drive'
+    """
+    if boundary == gol.DEAD:
+        return P2LifeEngine(boundary=gol.DEAD)
+    if boundary == gol.UNBOUNDED:
+        return UnboundedEngine()
+    if boundary != gol.WRAP:
+        raise ValueError("Unknown boundary {}".format(boundary))
+    if name == AUTO:
+        return autotune(rows, cols)
+    try:
+        cls = ENGINES[name]
+    except KeyError:
+        raise KeyError("Unknown engine {}".format(name))
+    return cls()
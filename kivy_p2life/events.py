@@ -1,3 +1,9 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from kivy.clock import Clock
+
 from .constants import Colours
 
 
@@ -17,9 +23,13 @@ class CustomEvent(object):
 
 class PatternEvent(CustomEvent):
 
-    def __init__(self, pattern, touch):
+    def __init__(self, pattern, touch, popcount=None):
         super(PatternEvent, self).__init__(touch)
         self.pattern = pattern
+        if popcount is None:
+            popcount = int(np.count_nonzero(pattern))
+        # The number of live cells in the pattern
+        self.popcount = popcount
 
     def __repr__(self):
         return "{}(\n\tpattern={},\n\ttouch={}\n)".format(
@@ -63,7 +73,9 @@ AdminResetEvent = type("AdminResetEvent", (CustomEvent, ), {
 
 def propagate_events(widget, name, evt):
     """ Propagate the event to the widget's children.
-    This is similar to how Window handles propagation, but more flexible."""
+    This is similar to how Window handles propagation, but more flexible.
+
+    See :class:`EventRouter` for a faster way to do this repeatedly."""
     for w in widget.children[:]:
         try:
             value = w.dispatch(name, evt)
@@ -71,3 +83,142 @@ def propagate_events(widget, name, evt):
             value = propagate_events(w, name, evt)
         if value:
             return True
+
+
+class EventRouter(object):
+
+    """ Propagate events to a widget's children, like propagate_events
+
+    The widgets which would receive each event are found once and kept in
+    an index, so dispatching an event doesn't walk the whole widget tree or
+    try to dispatch to widgets which haven't registered it. The index is
+    thrown away whenever the children of a widget it walked through change.
+
+    :param widget: The widget whose children receive the events
+
+    >>> from kivy.uix.widget import Widget
+    >>> class Target(Widget):
+    ...     def __init__(self, **kwargs):
+    ...         self.register_event_type("on_ping")
+    ...         super(Target, self).__init__(**kwargs)
+    ...     def on_ping(self, evt):
+    ...         evt.append(self)
+    >>> root, box, first = Widget(), Widget(), Target()
+    >>> box.add_widget(first)
+    >>> root.add_widget(box)
+    >>> router = EventRouter(root)
+    >>> pinged = []
+    >>> router.dispatch("on_ping", pinged)
+    >>> pinged == [first]
+    True
+    >>> second = Target()
+    >>> box.add_widget(second)
+    >>> pinged = []
+    >>> router.dispatch("on_ping", pinged)
+    >>> pinged == [second, first]
+    True
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        # Event name -> the widgets which receive it, in dispatch order
+        self._routes = {}
+        # Widgets whose children the routes depend on, by id
+        self._watched = {}
+
+    def invalidate(self, *args):
+        """Forget the routes, so that they're found again when needed"""
+        for widget in self._watched.values():
+            widget.unbind(children=self.invalidate)
+        self._watched = {}
+        self._routes = {}
+
+    def _watch(self, widget):
+        if id(widget) not in self._watched:
+            widget.bind(children=self.invalidate)
+            self._watched[id(widget)] = widget
+
+    def _find_targets(self, widget, name, targets):
+        # The same walk as propagate_events: widgets which registered the
+        # event receive it instead of their children
+        self._watch(widget)
+        for child in widget.children:
+            if child.is_event_type(name):
+                targets.append(child)
+            else:
+                self._find_targets(child, name, targets)
+        return targets
+
+    def routes(self, name):
+        """The widgets which receive an event, in dispatch order"""
+        if name not in self._routes:
+            self._routes[name] = tuple(self._find_targets(self.widget, name,
+                                                          []))
+        return self._routes[name]
+
+    def dispatch(self, name, evt):
+        """Dispatch the event until a widget returns True"""
+        for widget in self.routes(name):
+            if widget.dispatch(name, evt):
+                return True
+
+
+class MoveCoalescer(object):
+
+    """ Deliver at most one move per touch per frame
+
+    Touch trackers can send many moves per frame. Each move replaces any
+    move already waiting for the same touch id, and the latest move for each
+    touch (with its latest position and angle) is passed to the handler on
+    the next frame.
+
+    :param handler: Called with each coalesced touch
+
+    >>> import mock
+    >>> delivered = []
+    >>> moves = MoveCoalescer(delivered.append)
+    >>> moves.move(mock.Mock(id=1, pos=(0, 0)))
+    >>> moves.move(mock.Mock(id=2, pos=(5, 5)))
+    >>> moves.move(mock.Mock(id=1, pos=(1, 0)))
+    >>> delivered
+    []
+    >>> moves.flush()
+    >>> [(touch.id, touch.pos) for touch in delivered]
+    [(1, (1, 0)), (2, (5, 5))]
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        # Touch id -> latest touch, in the order the touches first moved
+        self._pending = OrderedDict()
+        self._scheduled = False
+
+    def move(self, touch):
+        """Queue a move for the next frame"""
+        self._pending[touch.id] = touch
+        if not self._scheduled:
+            self._scheduled = True
+            Clock.schedule_once(self._on_frame, 0)
+
+    def flush(self, touch_id=None):
+        """ Deliver the queued moves now
+
+        Call this with the touch's id before handling it going down or up,
+        so that its last move is handled first.
+
+        :param touch_id: If specified, only deliver this touch's move
+        """
+        if touch_id is None:
+            pending, self._pending = self._pending, OrderedDict()
+            touches = pending.values()
+        elif touch_id in self._pending:
+            touches = [self._pending.pop(touch_id)]
+        else:
+            touches = []
+        for touch in touches:
+            self.handler(touch)
+
+    def _on_frame(self, dt):
+        self._scheduled = False
+        self.flush()
+
@@ -4,10 +4,36 @@
 http://jakevdp.github.io/blog/2013/08/07/conways-game-of-life/
 """
 
+from collections import deque, namedtuple
+
 import numpy as np
 
 from .constants import Colours
 
+# Constants for tie_break's hash (from splitmix64 and murmur3)
+_HASH_ROW = np.uint64(0x9E3779B97F4A7C15)
+_HASH_COL = np.uint64(0xC2B2AE3D27D4EB4F)
+_HASH_GENERATION = np.uint64(0x165667B19E3779F9)
+_HASH_MIX_1 = np.uint64(0xFF51AFD7ED558CCD)
+_HASH_MIX_2 = np.uint64(0xC4CEB9FE1A85EC53)
+_HASH_SHIFT = np.uint64(33)
+
+# Boundary modes: the board wraps around, everything beyond its edges is
+# empty, or the board grows to fit (see kivy_p2life.unbounded)
+WRAP = "wrap"
+DEAD = "dead"
+UNBOUNDED = "unbounded"
+
+# scipy.signal.convolve2d's name for each boundary mode
+_CONVOLVE_BOUNDARIES = {WRAP: "wrap", DEAD: "fill"}
+
+# What happened in one generation: births, deaths, survivals and contested
+# (B/W) births are dicts of counts by colour, and bounding_box is the
+# (top, left, bottom, right) of the new live cells, or None if there are none
+GenerationStats = namedtuple(
+    "GenerationStats",
+    ["births", "deaths", "survivals", "contested", "bounding_box"])
+
 
 def life_step_1(X):
     """Game of life step using generator expressions"""
@@ -25,25 +51,270 @@ def life_step_2(X):
     return (nbrs_count == 3) | (X & (nbrs_count == 2))
 
 
-def p2life_step(X):
+def neighbour_count(plane, boundary=WRAP):
+    """Count each cell's neighbours with separable, wrapping integer sums
+
+    The last two axes are the board, so a stack of boards can be counted at
+    once; each board wraps independently.
+
+    >>> neighbour_count(np.array([[0, 0, 0, 0], [0, 1, 1, 0], [0, 0, 0, 0]]))
+    array([[1, 2, 2, 1],
+           [1, 1, 1, 1],
+           [1, 2, 2, 1]])
+    >>> neighbour_count(np.array([[0, 0, 0, 0], [0, 1, 1, 0], [0, 0, 0, 0]]), boundary=DEAD)
+    array([[1, 2, 2, 1],
+           [1, 1, 1, 1],
+           [1, 2, 2, 1]])
+    >>> neighbour_count(np.array([[1, 0, 0, 1]]), boundary=DEAD)
+    array([[0, 1, 1, 0]])
+    """
+    plane = np.asarray(plane).astype(int)
+    if boundary == DEAD:
+        padded = np.zeros(plane.shape[:-2] +
+                          (plane.shape[-2] + 2, plane.shape[-1] + 2),
+                          dtype=int)
+        padded[..., 1:-1, 1:-1] = plane
+        vertical = (padded[..., :-2, :] + padded[..., 1:-1, :] +
+                    padded[..., 2:, :])
+        total = (vertical[..., :-2] + vertical[..., 1:-1] +
+                 vertical[..., 2:])
+        return total - plane
+    if boundary != WRAP:
+        raise ValueError("Unknown boundary {}".format(boundary))
+    vertical = plane + np.roll(plane, 1, -2) + np.roll(plane, -1, -2)
+    total = vertical + np.roll(vertical, 1, -1) + np.roll(vertical, -1, -1)
+    return total - plane
+
+
+def tie_break(rows, cols, generation, seed=0):
+    """Choose the colours of B/W births by hashing position and generation
+
+    This is a counter-based random number generator: the result depends only
+    on its arguments, so it is the same whichever order (or process) the
+    cells are evolved in.
+
+    Parameters
+    ----------
+    rows, cols : int or array_like
+        board coordinates of the births; negative coordinates must be
+        given as integer arrays
+    generation : int
+        the generation being evolved
+    seed : int or array_like
+        varies the choices between runs
+
+    >>> tie_break([0, 0, 5], [1, 2, 5], 7)
+    array([2, 1, 1])
+    >>> tie_break(0, 1, 7)
+    2
+    """
+    scalar = np.ndim(rows) == 0 and np.ndim(cols) == 0
+    with np.errstate(over="ignore"):
+        h = (np.asarray(rows, dtype=np.uint64) * _HASH_ROW +
+             np.asarray(cols, dtype=np.uint64) * _HASH_COL +
+             np.uint64(generation) * _HASH_GENERATION +
+             np.asarray(seed, dtype=np.uint64))
+        h = (h ^ (h >> _HASH_SHIFT)) * _HASH_MIX_1
+        h = (h ^ (h >> _HASH_SHIFT)) * _HASH_MIX_2
+        h ^= h >> _HASH_SHIFT
+    colours = np.where(h & np.uint64(1), Colours.WHITE, Colours.BLACK)
+    return int(colours) if scalar else colours
+
+
+class TieBreak(object):
+
+    """Reproducible B/W birth tie-break using :func:`tie_break`
+
+    Pass an instance as the ``random_state`` of a step function; its
+    generation counter moves on by one every step.
+    """
+
+    def __init__(self, seed=0, generation=0):
+        self.seed = seed
+        self.generation = generation
+
+    def choose(self, positions):
+        """Return the colours for the births at the given positions
+
+        :param positions: (rows, cols), or (boards, rows, cols) for a stack
+            of boards; each board in a stack gets its own choices
+        """
+        seed = np.uint64(self.seed)
+        if len(positions) == 3:
+            with np.errstate(over="ignore"):
+                seed = seed + (np.asarray(positions[0], dtype=np.uint64) *
+                               _HASH_MIX_1)
+        return tie_break(positions[-2], positions[-1], self.generation, seed)
+
+
+def resolve_births(new, random_state=None, coordinates=None):
+    """Replace Colours.UNKNOWN (B/W births) in a new generation
+
+    Only the contested cells draw random numbers.
+
+    Parameters
+    ----------
+    new : ndarray
+        the new generation, which is modified in place
+    random_state : RandomState or TieBreak, optional
+        the source of randomness (defaults to numpy's global random state)
+    coordinates : (rows, cols), optional
+        board coordinates of each cell in new, for when new is only part of
+        the board; they must broadcast to new's shape
+
+    >>> resolve_births(np.array([[3, 0, 3]]), TieBreak(generation=7))
+    array([[2, 0, 1]])
+    """
+    contested = np.nonzero(new == Colours.UNKNOWN)
+    if len(contested[0]):
+        if isinstance(random_state, TieBreak):
+            positions = contested
+            if coordinates is not None:
+                rows, cols = np.broadcast_arrays(*coordinates)[-2:]
+                positions = (rows[contested], cols[contested])
+            new[contested] = random_state.choose(positions)
+        else:
+            if random_state is None:
+                random_state = np.random
+            new[contested] = random_state.randint(
+                Colours.WHITE, Colours.BLACK + 1, len(contested[0]))
+    if isinstance(random_state, TieBreak):
+        random_state.generation += 1
+    return new
+
+
+def population(X):
+    """Count the cells of each colour
+
+    >>> population([[1, 2, 1], [0, 0, 1]]) == {Colours.WHITE: 3, Colours.BLACK: 1}
+    True
+    """
+    counts = np.bincount(np.asarray(X, dtype=int).ravel(),
+                         minlength=Colours.BLACK + 1)
+    return {Colours.WHITE: int(counts[Colours.WHITE]),
+            Colours.BLACK: int(counts[Colours.BLACK])}
+
+
+def bounding_box(X):
+    """Return the (top, left, bottom, right) of the live cells, where bottom
+    and right are exclusive, or None if there are no live cells
+
+    >>> bounding_box(np.array([[0, 0, 0], [0, 1, 0], [0, 0, 2]]))
+    (1, 1, 3, 3)
+    >>> bounding_box(np.zeros((2, 2))) is None
+    True
+    """
+    rows = np.flatnonzero(X.any(axis=1))
+    if not len(rows):
+        return None
+    cols = np.flatnonzero(X.any(axis=0))
+    return (int(rows[0]), int(cols[0]), int(rows[-1]) + 1, int(cols[-1]) + 1)
+
+
+def _add_deltas(deltas, born, dead):
+    """Add per-colour counts to a deltas dict"""
+    for colour in (Colours.WHITE, Colours.BLACK):
+        births, deaths = deltas.get(colour, (0, 0))
+        deltas[colour] = (births + int(born[colour]),
+                          deaths + int(dead[colour]))
+
+
+def births_and_deaths(old, new, deltas=None):
+    """Count each colour's births and deaths between two boards
+
+    This is for engines which can't count them as they go; a cell which
+    changes colour counts as a death and a birth.
+
+    Parameters
+    ----------
+    old, new : ndarray
+        the boards before and after
+    deltas : dict, optional
+        counts are added to this dict, which is returned
+
+    >>> births_and_deaths(np.array([[1, 1, 0]]), np.array([[1, 0, 2]])) == {Colours.WHITE: (0, 1), Colours.BLACK: (1, 0)}
+    True
+    """
+    if deltas is None:
+        deltas = {}
+    changed = old != new
+    _add_deltas(deltas, population(new[changed]), population(old[changed]))
+    return deltas
+
+
+def p2life_step(X, random_state=None, boundary=WRAP, deltas=None,
+                stats=None):
     """P2Life implementation using scipy tools.
     For more on P2Life see
     http://www.dcs.bbk.ac.uk/~gr/software/p2life/p2life.php
 
+    :param random_state: RandomState or TieBreak used for B/W births
+    :param boundary: WRAP or DEAD
+    :param deltas: if given, each colour's (births, deaths) are added to
+        this dict
+    :param stats: if given, a list to append this generation's
+        GenerationStats to
+
     Simple evolution:
 
     >>> p2life_step(np.array([[1, 2, 1], [1, 2, 1], [1, 2, 1]]))
     array([[1, 0, 1],
            [1, 0, 1],
            [1, 0, 1]])
+
+    Seeded runs are reproducible:
+
+    >>> X = np.array([[0, 1, 1, 1, 0, 0], [0, 0, 0, 0, 0, 0], [0, 2, 2, 2, 0, 0]])
+    >>> results = [p2life_step(X, np.random.RandomState(4)) for i in range(2)]
+    >>> (results[0] == results[1]).all()
+    True
+
+    With dead edges, a spinner fits in a 3x3 board:
+
+    >>> p2life_step(np.array([[0, 0, 0], [1, 1, 1], [0, 0, 0]]), boundary=DEAD)
+    array([[0, 1, 0],
+           [0, 1, 0],
+           [0, 1, 0]])
     """
     from scipy.signal import convolve2d
+    try:
+        mode = _CONVOLVE_BOUNDARIES[boundary]
+    except KeyError:
+        raise ValueError("Unknown boundary {}".format(boundary))
     ones = np.ones((3, 3))
-    empties = X == Colours.EMPTY
     whites = X == Colours.WHITE
     blacks = X == Colours.BLACK
-    white_nbrs = convolve2d(whites, ones, mode='same', boundary='wrap') - whites
-    black_nbrs = convolve2d(blacks, ones, mode='same', boundary='wrap') - blacks
+    white_nbrs = convolve2d(whites, ones, mode='same', boundary=mode) - whites
+    black_nbrs = convolve2d(blacks, ones, mode='same', boundary=mode) - blacks
+    return p2life_rule(X, white_nbrs, black_nbrs, random_state,
+                       deltas=deltas, stats=stats)
+
+
+def p2life_rule(X, white_nbrs, black_nbrs, random_state=None,
+                coordinates=None, deltas=None, stats=None):
+    """Apply the P2Life rules given each cell's neighbour counts
+
+    Parameters
+    ----------
+    X : ndarray
+        the game board
+    white_nbrs, black_nbrs : ndarray
+        the number of white and black neighbours of each cell in X
+    random_state : RandomState or TieBreak, optional
+    coordinates : (rows, cols), optional
+        see :func:`resolve_births`
+    deltas : dict, optional
+        each colour's (births, deaths) are added to this dict
+    stats : list, optional
+        this generation's GenerationStats is appended to this list
+
+    >>> deltas = {}
+    >>> p2life_rule(np.array([[1, 0]]), np.array([[0, 0]]), np.array([[0, 0]]), deltas=deltas)
+    array([[0, 0]])
+    >>> deltas == {Colours.WHITE: (0, 1), Colours.BLACK: (0, 0)}
+    True
+    """
+    empties = X == Colours.EMPTY
 
     # Birth: The cell has exactly three same colour neighbours and the number
     # of different colour neighbours is different from three.
@@ -52,8 +323,7 @@ def p2life_step(X):
     birth = (white_birth * Colours.WHITE) + (black_birth * Colours.BLACK)
 
     # B/W birth: The cell has exactly three white and three black neighbours.
-    unknown_birth = (birth == Colours.UNKNOWN) * np.random.randint(Colours.WHITE, Colours.BLACK + 1, X.shape)
-    birth = (birth * (birth != Colours.UNKNOWN)) | unknown_birth
+    birth = resolve_births(birth, random_state, coordinates)
 
     # Survival: If the difference between the number of white and black
     # neighbours is two or three.
@@ -67,18 +337,156 @@ def p2life_step(X):
     black_survival = (nbr_diff == 1) & (black_nbrs >= 2)
     survival = (survival | white_survival | black_survival) * X
 
-    return birth | survival
+    new = birth | survival
+
+    # Counts come from the masks above, rather than from comparing boards
+    if deltas is not None or stats is not None:
+        born = population(birth)
+        dead = population(X - survival)
+        if deltas is not None:
+            _add_deltas(deltas, born, dead)
+        if stats is not None:
+            stats.append(GenerationStats(
+                births=born, deaths=dead, survivals=population(survival),
+                contested=population(birth[white_birth & black_birth]),
+                bounding_box=bounding_box(new)))
+
+    return new
 
 life_step = p2life_step
 
 
-def life_animation(X):
+def advance(X, generations, step=None):
+    """Evolve the board by several generations, returning only the last
+
+    Parameters
+    ----------
+    X : array_like
+        a two-dimensional numpy array showing the game board
+    generations : int
+        the number of generations to evolve
+    step : callable, optional
+        the step function or engine to use (defaults to ``life_step``); if
+        it has an ``advance`` method, that is used instead
+
+    >>> advance(np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]), 3)
+    array([[0, 0, 0, 0, 0],
+           [0, 0, 1, 0, 0],
+           [0, 0, 1, 0, 0],
+           [0, 0, 1, 0, 0],
+           [0, 0, 0, 0, 0]])
+    """
+    if step is None:
+        step = life_step
+    if hasattr(step, "advance"):
+        return step.advance(X, generations)
+    X = np.asarray(X).astype(int)
+    for unused in range(generations):
+        X = step(X)
+    return X
+
+
+def has_contested_births(X, boundary=WRAP):
+    """Whether any empty cell has exactly three white and three black
+    neighbours, ie. whether the next generation needs a tie-break
+
+    >>> has_contested_births(np.array([[1, 1, 1], [0, 0, 0], [2, 2, 2]]))
+    True
+    >>> has_contested_births(np.array([[1, 1, 1], [0, 0, 0], [0, 0, 0]]))
+    False
+    """
+    X = np.asarray(X)
+    contested = ((X == Colours.EMPTY) &
+                 (neighbour_count(X == Colours.WHITE, boundary) == 3) &
+                 (neighbour_count(X == Colours.BLACK, boundary) == 3))
+    return bool(contested.any())
+
+
+class CycleDetector(object):
+
+    """Spot still lifes and short cycles in a sequence of generations
+
+    Once a cycle is found, later generations can be worked out from the
+    cycle's phase instead of being simulated. A repeat only counts as a
+    cycle if no generation in it used the B/W birth tie-break, so the
+    prediction is exact.
+
+    Parameters
+    ----------
+    X : array_like
+        the board before the first generation
+    max_period : int
+        the longest cycle to look for
+    boundary : str
+        WRAP or DEAD; an unbounded board can't be checked from a window
+
+    A spinner has period 2:
+
+    >>> detector = CycleDetector(np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]))
+    >>> anim = life_animation(detector.latest)
+    >>> detector.add(anim.next())
+    >>> detector.add(anim.next())
+    2
+    >>> detector.predict(3)[1:4, 1:4]
+    array([[0, 1, 0],
+           [0, 1, 0],
+           [0, 1, 0]])
+    """
+
+    def __init__(self, X, max_period=4, boundary=WRAP):
+        self.max_period = max_period
+        self.boundary = boundary
+        self.period = None
+        # (hash, board, has contested births) for recent generations
+        self._history = deque(maxlen=max_period + 1)
+        self._append(np.asarray(X))
+
+    @property
+    def latest(self):
+        return self._history[-1][1]
+
+    def _append(self, X):
+        self._history.append([hash(X.tostring()), X, None])
+
+    def _deterministic(self, entry):
+        if entry[2] is None:
+            entry[2] = has_contested_births(entry[1], self.boundary)
+        return not entry[2]
+
+    def add(self, X):
+        """Record the next generation, and return the cycle's period if one
+        has been found"""
+        X = np.asarray(X)
+        self._append(X)
+        key = self._history[-1][0]
+        history = list(self._history)
+        for period in range(1, len(history)):
+            old_key, old_board, unused = history[-1 - period]
+            if old_key != key or not np.array_equal(old_board, X):
+                continue
+            if all(self._deterministic(entry)
+                   for entry in history[-1 - period:-1]):
+                self.period = period
+                return period
+        return None
+
+    def predict(self, generations):
+        """Return the board this many generations after the latest one"""
+        assert self.period is not None, "No cycle has been found"
+        cycle = [entry[1] for entry in list(self._history)[-self.period:]]
+        return cycle[(generations - 1) % self.period]
+
+
+def life_animation(X, step=None):
     """Produce a Game of Life Animation
 
     Parameters
     ----------
     X : array_like
         a two-dimensional numpy array showing the game board
+    step : callable, optional
+        the step function to use, eg. :func:`kivy_p2life.bitboard.bitboard_step`
+        (defaults to ``life_step``)
 
     Simple spinner (it must be a 5x5 because our implementation wraps):
 
@@ -99,10 +507,47 @@ def life_animation(X):
     X = np.asarray(X)
     assert X.ndim == 2
     X = X.astype(int)
+    if step is None:
+        step = life_step
 
     def _iterate(X):
         while True:
-            X = life_step(X)
+            X = step(X)
             yield X
 
     return _iterate(X)
+
+
+def stats_animation(X, random_state=None, boundary=WRAP):
+    """Produce a P2Life animation which yields (board, GenerationStats)
+    pairs
+
+    Parameters
+    ----------
+    X : array_like
+        a two-dimensional numpy array showing the game board
+    random_state : RandomState or TieBreak, optional
+        source of the B/W birth tie-breaks
+    boundary : str
+        WRAP or DEAD
+
+    >>> gen = stats_animation(np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]))
+    >>> board, stats = gen.next()
+    >>> stats.births[Colours.WHITE], stats.deaths[Colours.WHITE]
+    (2, 2)
+    >>> stats.survivals[Colours.WHITE], stats.contested[Colours.WHITE]
+    (1, 0)
+    >>> stats.bounding_box
+    (1, 2, 4, 3)
+    """
+    X = np.asarray(X)
+    assert X.ndim == 2
+    X = X.astype(int)
+
+    def _iterate(X):
+        stats = []
+        while True:
+            X = p2life_step(X, random_state, boundary, stats=stats)
+            yield X, stats.pop()
+
+    return _iterate(X)
@@ -0,0 +1,404 @@
+"""Memoized quadtree (HashLife-style) P2Life engine
+
+The board is stored as a canonicalised quadtree, so identical regions share a
+single node. The result of evolving a node is memoized, which lets the engine
+jump 2^k generations at once.
+
+P2Life's B/W birth rule needs a tie-break. To keep the results reproducible
+this uses :func:`kivy_p2life.gol.tie_break`, which is keyed on the cell
+position and the generation. A result which needed the tie-break depends on
+where the node is, so it is only cached for the duration of a single jump;
+every other result is memoized for good.
+"""
+
+import numpy as np
+
+from .constants import Colours
+from .gol import tie_break
+from .rules import p2life
+
+
+class Node(object):
+
+    """A square quadtree node of side 2 ** level
+
+    Level 1 nodes have cell values as children; all other nodes have Nodes.
+    Always create nodes with :meth:`HashLife.join` so they are canonical.
+    """
+
+    __slots__ = ("nw", "ne", "sw", "se", "level", "population")
+
+    def __init__(self, nw, ne, sw, se, level, population):
+        self.nw = nw
+        self.ne = ne
+        self.sw = sw
+        self.se = se
+        self.level = level
+        self.population = population
+
+
+class HashLife(object):
+
+    """HashLife engine for toroidal P2Life boards
+
+    Boards of any size are supported: each jump evolves the periodic lift of
+    the board (ie. infinitely many copies of it, side by side), which behaves
+    exactly like ``boundary='wrap'``.
+
+    Parameters
+    ----------
+    seed : int
+        seed for :func:`kivy_p2life.gol.tie_break`
+    max_nodes : int
+        when the node table grows beyond this, all caches are dropped
+    """
+
+    def __init__(self, seed=0, max_nodes=1000000):
+        self.seed = seed
+        self.max_nodes = max_nodes
+        self.generation = 0
+        self._board = self._board_node = None
+        self.clear()
+
+    def clear(self):
+        """Drop all canonical nodes and memoized results"""
+        self._nodes = {}
+        self._results = {}
+        self._empties = {0: Colours.EMPTY}
+
+    def join(self, nw, ne, sw, se):
+        """Return the canonical node with the given quadrants"""
+        key = (nw, ne, sw, se)
+        try:
+            return self._nodes[key]
+        except KeyError:
+            pass
+        if isinstance(nw, Node):
+            level = nw.level + 1
+            population = (nw.population + ne.population +
+                          sw.population + se.population)
+        else:
+            level = 1
+            population = sum(1 for cell in key if cell != Colours.EMPTY)
+        node = self._nodes[key] = Node(nw, ne, sw, se, level, population)
+        return node
+
+    def empty(self, level):
+        """Return the canonical empty node of the given level"""
+        if level not in self._empties:
+            child = self.empty(level - 1)
+            self._empties[level] = self.join(child, child, child, child)
+        return self._empties[level]
+
+    def _centre(self, node):
+        return self.join(node.nw.se, node.ne.sw, node.sw.ne, node.se.nw)
+
+    def from_periodic(self, rows, level, top, left, cache=None):
+        """Build a node from the periodic lift of a board
+
+        :param rows: the board, as a list of lists
+        :param level: level of the node to build
+        :param top: row of the node's top-left corner (may be out of range)
+        :param left: column of the node's top-left corner
+
+        Nodes are cached by their offset within the board, so building a
+        node much larger than the board is cheap.
+        """
+        height, width = len(rows), len(rows[0])
+        top %= height
+        left %= width
+        if level == 0:
+            return rows[top][left]
+        if cache is None:
+            cache = {}
+        key = (level, top, left)
+        if key not in cache:
+            half = 1 << (level - 1)
+            cache[key] = self.join(
+                self.from_periodic(rows, level - 1, top, left, cache),
+                self.from_periodic(rows, level - 1, top, left + half, cache),
+                self.from_periodic(rows, level - 1, top + half, left, cache),
+                self.from_periodic(rows, level - 1, top + half, left + half,
+                                   cache),
+            )
+        return cache[key]
+
+    def to_array(self, node, shape=None, out=None, top=0, left=0):
+        """Write the cells of a node into a numpy array
+
+        :param shape: only fill this many rows and columns from the node's
+            top-left corner (defaults to the whole node)
+        """
+        if out is None:
+            if shape is None:
+                shape = (1 << node.level, 1 << node.level)
+            out = np.zeros(shape, dtype=int)
+        if top >= out.shape[0] or left >= out.shape[1]:
+            return out
+        if not isinstance(node, Node):
+            out[top, left] = node
+        elif node.population:
+            half = 1 << (node.level - 1)
+            self.to_array(node.nw, out=out, top=top, left=left)
+            self.to_array(node.ne, out=out, top=top, left=left + half)
+            self.to_array(node.sw, out=out, top=top + half, left=left)
+            self.to_array(node.se, out=out, top=top + half, left=left + half)
+        return out
+
+    def _base_result(self, node, top, left, generation):
+        """Evolve the centre of a level 2 node by one generation"""
+        grid = [
+            [node.nw.nw, node.nw.ne, node.ne.nw, node.ne.ne],
+            [node.nw.sw, node.nw.se, node.ne.sw, node.ne.se],
+            [node.sw.nw, node.sw.ne, node.se.nw, node.se.ne],
+            [node.sw.sw, node.sw.se, node.se.sw, node.se.se],
+        ]
+        pure = True
+        cells = []
+        for y in (1, 2):
+            for x in (1, 2):
+                whites = blacks = 0
+                for dy in (-1, 0, 1):
+                    for dx in (-1, 0, 1):
+                        if dy or dx:
+                            neighbour = grid[y + dy][x + dx]
+                            whites += neighbour == Colours.WHITE
+                            blacks += neighbour == Colours.BLACK
+                state = p2life(grid[y][x], whites, blacks)
+                if state == Colours.UNKNOWN:
+                    pure = False
+                    state = tie_break((top + y) % self._rows,
+                                      (left + x) % self._cols,
+                                      generation, self.seed)
+                cells.append(state)
+        return self.join(*cells), pure
+
+    def result(self, node, step_log2, top, left, generation):
+        """Evolve a node by 2 ** step_log2 generations
+
+        Returns the centre of the node (one level down) and whether the
+        result is independent of the node's position.
+
+        Parameters
+        ----------
+        node : Node
+            a node with level >= 2 and level - 2 >= step_log2
+        top, left : int
+            position of the node in board coordinates
+        generation : int
+            generation of the node's cells
+        """
+        level = node.level
+        if not node.population:
+            return self.empty(level - 1), True
+        key = (node, step_log2)
+        if key in self._results:
+            return self._results[key], True
+        local_key = (node, step_log2, top % self._rows, left % self._cols,
+                     generation)
+        if local_key in self._local_results:
+            return self._local_results[local_key], False
+
+        if level == 2:
+            result, pure = self._base_result(node, top, left, generation)
+        else:
+            result, pure = self._recursive_result(node, step_log2, top, left,
+                                                  generation)
+
+        if pure:
+            self._results[key] = result
+        else:
+            self._local_results[local_key] = result
+        return result, pure
+
+    def _recursive_result(self, node, step_log2, top, left, generation):
+        level = node.level
+        half = 1 << (level - 2)
+        quarter = half >> 1
+        nw, ne, sw, se = node.nw, node.ne, node.sw, node.se
+        # The nine overlapping sub-nodes of level - 1
+        subnodes = [
+            [nw, self.join(nw.ne, ne.nw, nw.se, ne.sw), ne],
+            [self.join(nw.sw, nw.se, sw.nw, sw.ne),
+             self.join(nw.se, ne.sw, sw.ne, se.nw),
+             self.join(ne.sw, ne.se, se.nw, se.ne)],
+            [sw, self.join(sw.ne, se.nw, sw.se, se.sw), se],
+        ]
+        pure = True
+        if step_log2 == level - 2:
+            # Two half-steps: evolve the nine sub-nodes, then evolve the four
+            # nodes made from their results.
+            first_steps = 1 << (level - 3)
+            inner = [[None] * 3 for i in range(3)]
+            for i in range(3):
+                for j in range(3):
+                    inner[i][j], sub_pure = self.result(
+                        subnodes[i][j], level - 3, top + i * half,
+                        left + j * half, generation)
+                    pure = pure and sub_pure
+            generation += first_steps
+            second_log2 = level - 3
+        else:
+            # Step-limited: take the centres of the nine sub-nodes, then
+            # evolve the four nodes made from them.
+            inner = [[self._centre(subnode) for subnode in row]
+                     for row in subnodes]
+            second_log2 = step_log2
+
+        quadrants = []
+        for i in range(2):
+            for j in range(2):
+                combined = self.join(inner[i][j], inner[i][j + 1],
+                                     inner[i + 1][j], inner[i + 1][j + 1])
+                quadrant, sub_pure = self.result(
+                    combined, second_log2, top + i * half + quarter,
+                    left + j * half + quarter, generation)
+                pure = pure and sub_pure
+                quadrants.append(quadrant)
+        return self.join(*quadrants), pure
+
+    def load(self, X):
+        """ Make X the board to be evolved
+
+        A square board whose side is a power of two lines up with the
+        quadtree, so it's kept as a node between jumps, and between calls to
+        :meth:`evolve`; it's only turned back into an array when
+        :attr:`board` is read. Other boards are lifted from the array for
+        each jump.
+        """
+        X = np.asarray(X).astype(int)
+        assert X.ndim == 2
+        self._rows, self._cols = X.shape
+        self._board = X
+        self._board_node = None
+        side = self._rows
+        if side == self._cols and side >= 2 and not side & (side - 1):
+            level = side.bit_length() - 1
+            self._board_node = self.from_periodic(X.tolist(), level, 0, 0)
+
+    @property
+    def board(self):
+        """The board being evolved, as an array"""
+        if self._board is None:
+            self._board = self.to_array(self._board_node)
+        return self._board
+
+    def _lift(self, level):
+        """Build the node of the board's periodic lift which jump() evolves,
+        with its result's centre starting at (0, 0)"""
+        offset = -(1 << (level - 2))
+        node = self._board_node
+        if node is None:
+            return self.from_periodic(self.board.tolist(), level, offset,
+                                      offset)
+        if level == node.level + 1:
+            # Offset by half the board, so its quadrants swap places
+            node = self.join(node.se, node.sw, node.ne, node.nw)
+        while node.level < level:
+            node = self.join(node, node, node, node)
+        return node
+
+    def _jump(self, step_log2):
+        # The result of a level n node is its centre of side 2 ** (n - 1),
+        # which must cover the board.
+        level = step_log2 + 2
+        while (1 << (level - 1)) < max(self._rows, self._cols):
+            level += 1
+        root = self._lift(level)
+        offset = -(1 << (level - 2))
+
+        self._local_results = {}
+        result, pure = self.result(root, step_log2, offset, offset,
+                                   self.generation)
+        self._local_results = {}
+        self.generation += 1 << step_log2
+
+        if self._board_node is None:
+            self._board = self.to_array(result, (self._rows, self._cols))
+        else:
+            # The board is the top-left corner of the result
+            while result.level > self._board_node.level:
+                result = result.nw
+            self._board_node = result
+            self._board = None
+        if len(self._nodes) > self.max_nodes:
+            board = self.board
+            self.clear()
+            self.load(board)
+
+    def jump(self, X, step_log2):
+        """Evolve a dense board by 2 ** step_log2 generations"""
+        self.load(X)
+        self._jump(step_log2)
+        return self.board
+
+    def evolve(self, generations):
+        """ Evolve the loaded board by any number of generations
+
+        >>> engine = HashLife()
+        >>> blinker = np.zeros((4, 4), dtype=int)
+        >>> blinker[2, :3] = 1
+        >>> engine.load(blinker)
+        >>> engine.evolve(3)
+        >>> engine._board is None
+        True
+        >>> engine.board
+        array([[0, 0, 0, 0],
+               [0, 1, 0, 0],
+               [0, 1, 0, 0],
+               [0, 1, 0, 0]])
+        """
+        step_log2 = 0
+        while generations:
+            if generations & 1:
+                self._jump(step_log2)
+            generations >>= 1
+            step_log2 += 1
+
+    def advance(self, X, generations):
+        """Evolve a dense board by any number of generations
+
+        The spinner has period 2, so after 1001 generations it has flipped:
+
+        >>> engine = HashLife()
+        >>> engine.advance(np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]), 1001)
+        array([[0, 0, 0, 0, 0],
+               [0, 0, 1, 0, 0],
+               [0, 0, 1, 0, 0],
+               [0, 0, 1, 0, 0],
+               [0, 0, 0, 0, 0]])
+        >>> engine.generation
+        1001
+        """
+        self.load(X)
+        self.evolve(generations)
+        return self.board
+
+
+def hashlife_animation(X, generations_per_frame=1, seed=0):
+    """Produce a P2Life animation using the HashLife engine
+
+    Parameters
+    ----------
+    X : array_like
+        a two-dimensional numpy array showing the game board
+    generations_per_frame : int
+        how many generations to evolve between frames
+    seed : int
+        seed for the B/W birth tie-break
+
+    >>> gen = hashlife_animation(np.array([[1, 2, 1], [1, 2, 1], [1, 2, 1]]))
+    >>> gen.next()
+    array([[1, 0, 1],
+           [1, 0, 1],
+           [1, 0, 1]])
+    """
+    engine = HashLife(seed=seed)
+    X = np.asarray(X)
+
+    def _iterate(X):
+        while True:
+            X = engine.advance(X, generations_per_frame)
+            yield X
+
+    return _iterate(X)
@@ -0,0 +1,148 @@
+"""JIT-compiled P2Life engine
+
+When Numba is installed, the whole P2Life rule is compiled into one fused
+loop over the board, which counts both colours' neighbours and applies the
+rule in a single pass, optionally spread over several threads. B/W births
+are marked Colours.UNKNOWN by the loop and resolved afterwards, so any
+``random_state`` works. Without Numba, :class:`JITStepper` falls back to
+:func:`kivy_p2life.gol.p2life_step`.
+"""
+
+import numpy as np
+
+from .buffered import BufferedStepper
+from .constants import Colours
+from .gol import TieBreak, p2life_step, resolve_births
+
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = range
+
+AVAILABLE = njit is not None
+
+_EMPTY = Colours.EMPTY
+_WHITE = Colours.WHITE
+_BLACK = Colours.BLACK
+_UNKNOWN = Colours.UNKNOWN
+
+
+def _p2life_kernel(board, out):
+    """Write the next generation of board into out, wrapping at the edges,
+    and return the number of B/W births left as Colours.UNKNOWN
+
+    This is plain Python until it's compiled.
+
+    >>> out = np.zeros((3, 3), dtype=int)
+    >>> _p2life_kernel(np.array([[1, 1, 1], [0, 0, 0], [2, 2, 2]]), out)
+    3
+    >>> out
+    array([[1, 1, 1],
+           [3, 3, 3],
+           [2, 2, 2]])
+    """
+    rows, cols = board.shape
+    contested = 0
+    for y in prange(rows):
+        for x in range(cols):
+            whites = 0
+            blacks = 0
+            for dy in range(-1, 2):
+                for dx in range(-1, 2):
+                    if dy == 0 and dx == 0:
+                        continue
+                    neighbour = board[(y + dy) % rows, (x + dx) % cols]
+                    if neighbour == _WHITE:
+                        whites += 1
+                    elif neighbour == _BLACK:
+                        blacks += 1
+            state = board[y, x]
+            new = _EMPTY
+            if state == _EMPTY:
+                if whites == 3 and blacks == 3:
+                    new = _UNKNOWN
+                    contested += 1
+                elif whites == 3:
+                    new = _WHITE
+                elif blacks == 3:
+                    new = _BLACK
+            else:
+                diff = abs(whites - blacks)
+                if (diff == 2 or diff == 3 or
+                        (diff == 1 and max(whites, blacks) >= 2)):
+                    new = state
+            out[y, x] = new
+    return contested
+
+
+if AVAILABLE:
+    _KERNELS = {
+        False: njit(_p2life_kernel),
+        True: njit(parallel=True)(_p2life_kernel),
+    }
+else:
+    _KERNELS = {}
+
+
+class JITStepper(BufferedStepper):
+
+    """A double-buffered P2Life step function using the compiled kernel
+
+    See :class:`kivy_p2life.buffered.BufferedStepper` for how the returned
+    boards are reused.
+
+    Parameters
+    ----------
+    random_state : RandomState or TieBreak, optional
+        source of the B/W birth tie-breaks
+    threads : bool
+        spread each generation over Numba's threads
+
+    >>> stepper = JITStepper()
+    >>> stepper(np.array([[1, 2, 1], [1, 2, 1], [1, 2, 1]]))
+    array([[1, 0, 1],
+           [1, 0, 1],
+           [1, 0, 1]])
+    """
+
+    def __init__(self, random_state=None, threads=True):
+        super(JITStepper, self).__init__(random_state)
+        self.threads = threads
+
+    def _allocate(self, shape):
+        # The kernel needs no scratch space
+        self._boards = (np.zeros(shape, dtype=int), np.zeros(shape, dtype=int))
+        self._shape = shape
+
+    def step(self):
+        board = self.board
+        new = self._boards[1 - self._parity]
+        if not AVAILABLE:
+            new[...] = p2life_step(board, self.random_state)
+        elif _KERNELS[bool(self.threads)](board, new):
+            resolve_births(new, self.random_state)
+        elif isinstance(self.random_state, TieBreak):
+            self.random_state.generation += 1
+        self._parity = 1 - self._parity
+        return new
+
+
+def jit_step(X, random_state=None):
+    """Evolve a board by one generation with the compiled kernel, or with
+    :func:`kivy_p2life.gol.p2life_step` if Numba isn't installed
+
+    >>> jit_step(np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]))[1:4, 1:4]
+    array([[0, 1, 0],
+           [0, 1, 0],
+           [0, 1, 0]])
+    """
+    X = np.asarray(X).astype(int)
+    if not AVAILABLE:
+        return p2life_step(X, random_state)
+    new = np.empty_like(X)
+    if _KERNELS[True](X, new):
+        resolve_births(new, random_state)
+    elif isinstance(random_state, TieBreak):
+        random_state.generation += 1
+    return new
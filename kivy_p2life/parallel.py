@@ -0,0 +1,199 @@
+"""Multi-core P2Life engine
+
+The board is split into bands of rows, each held in shared memory and
+evolved by its own worker process. Every band has a one-row halo above and
+below; after each generation, a worker copies its top and bottom rows into
+the halos of the neighbouring bands. Rows and columns wrap exactly like
+``boundary='wrap'``.
+
+:class:`ParallelStepper` is a step function, so it can be used anywhere
+:func:`kivy_p2life.gol.p2life_step` is, eg.
+``life_animation(X, step=ParallelStepper())``.
+"""
+
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray
+import traceback
+
+import numpy as np
+
+from .constants import Colours
+from .gol import TieBreak, p2life_rule
+
+_DTYPE = np.int8
+_TYPECODE = "b"
+
+
+def band_bounds(rows, bands):
+    """Split the board's rows into contiguous bands
+
+    >>> band_bounds(10, 3)
+    [(0, 3), (3, 6), (6, 10)]
+    """
+    edges = [rows * i // bands for i in range(bands + 1)]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+class Band(object):
+
+    """Shared, double-buffered storage for a band of rows plus its halos"""
+
+    def __init__(self, start, stop, cols):
+        self.start = start
+        self.stop = stop
+        self.cols = cols
+        size = (stop - start + 2) * cols
+        self._buffers = (RawArray(_TYPECODE, size), RawArray(_TYPECODE, size))
+
+    def buffer(self, parity):
+        """Numpy view of a buffer; row 0 and row -1 are the halos"""
+        return np.frombuffer(self._buffers[parity],
+                             dtype=_DTYPE).reshape(-1, self.cols)
+
+
+def _neighbours(plane):
+    """Count neighbours in the interior rows of a plane with halo rows"""
+    vertical = plane[:-2] + plane[1:-1] + plane[2:]
+    total = vertical + np.roll(vertical, 1, 1) + np.roll(vertical, -1, 1)
+    return total - plane[1:-1]
+
+
+def step_window(window, random_state=None, start=0):
+    """Evolve the interior rows of a window with a one-row halo
+
+    :param random_state: RandomState or TieBreak used for B/W births
+    :param start: the board row of the window's first interior row
+
+    >>> step_window(np.array([[1, 0, 0, 0], [1, 0, 0, 0], [1, 0, 0, 0]]))
+    array([[1, 1, 0, 1]])
+    """
+    whites = (window == Colours.WHITE).astype(int)
+    blacks = (window == Colours.BLACK).astype(int)
+    coordinates = (np.arange(start, start + len(window) - 2)[:, np.newaxis],
+                   np.arange(window.shape[1]))
+    return p2life_rule(window[1:-1].astype(int), _neighbours(whites),
+                       _neighbours(blacks), random_state, coordinates)
+
+
+def _worker(bands, index, conn, random_state):
+    count = len(bands)
+    own = [bands[index].buffer(parity) for parity in (0, 1)]
+    above = [bands[(index - 1) % count].buffer(parity) for parity in (0, 1)]
+    below = [bands[(index + 1) % count].buffer(parity) for parity in (0, 1)]
+    while True:
+        parity = conn.recv()
+        if parity is None:
+            break
+        try:
+            new = step_window(own[parity], random_state,
+                              bands[index].start)
+            target = 1 - parity
+            own[target][1:-1] = new
+            # Halo exchange: our edge rows are our neighbours' halos
+            above[target][-1] = new[0]
+            below[target][0] = new[-1]
+        except Exception:
+            conn.send(traceback.format_exc())
+        else:
+            conn.send(None)
+    conn.close()
+
+
+class ParallelStepper(object):
+
+    """A P2Life step function which runs on multiple processes
+
+    Parameters
+    ----------
+    processes : int
+        the number of worker processes (defaults to the number of CPUs)
+    seed : int
+        seed for the workers' B/W birth tie-breaks; if not given, the seeds
+        are drawn from numpy's global random state
+    hashed : bool
+        use a :class:`kivy_p2life.gol.TieBreak`, so the results don't depend
+        on the number of processes
+
+    >>> stepper = ParallelStepper(processes=2)
+    >>> stepper(np.array([[1, 2, 1], [1, 2, 1], [1, 2, 1]]))
+    array([[1, 0, 1],
+           [1, 0, 1],
+           [1, 0, 1]])
+    >>> stepper.close()
+    """
+
+    def __init__(self, processes=None, seed=None, hashed=False):
+        self.processes = processes or multiprocessing.cpu_count()
+        self.seed = seed
+        self.hashed = hashed
+        self._shape = None
+        self._bands = []
+        self._workers = []
+        self._parity = 0
+
+    def _start(self, shape):
+        self.close()
+        rows, cols = shape
+        bounds = band_bounds(rows, min(self.processes, rows))
+        self._bands = [Band(start, stop, cols) for start, stop in bounds]
+        for index in range(len(self._bands)):
+            if self.hashed:
+                random_state = TieBreak(self.seed or 0)
+            elif self.seed is None:
+                random_state = np.random.RandomState(np.random.randint(2 ** 31))
+            else:
+                random_state = np.random.RandomState(self.seed + index)
+            conn, child_conn = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_worker,
+                args=(self._bands, index, child_conn, random_state))
+            process.daemon = True
+            process.start()
+            self._workers.append((process, conn))
+        self._shape = shape
+
+    def close(self):
+        """Stop the worker processes"""
+        for process, conn in self._workers:
+            conn.send(None)
+            process.join()
+            conn.close()
+        self._workers = []
+        self._bands = []
+        self._shape = None
+
+    def _scatter(self, X):
+        rows = X.shape[0]
+        for band in self._bands:
+            buf = band.buffer(self._parity)
+            buf[1:-1] = X[band.start:band.stop]
+            buf[0] = X[band.start - 1]
+            buf[-1] = X[band.stop % rows]
+
+    def _gather(self):
+        return np.concatenate([band.buffer(self._parity)[1:-1]
+                               for band in self._bands]).astype(int)
+
+    def _run_generation(self):
+        for process, conn in self._workers:
+            conn.send(self._parity)
+        errors = [conn.recv() for process, conn in self._workers]
+        self._parity = 1 - self._parity
+        for error in errors:
+            if error is not None:
+                raise RuntimeError("Worker failed:\n{}".format(error))
+
+    def advance(self, X, generations):
+        """Evolve the board by several generations without leaving the
+        workers"""
+        X = np.asarray(X)
+        assert X.ndim == 2
+        if X.shape != self._shape:
+            self._start(X.shape)
+        self._scatter(X)
+        for unused in range(generations):
+            self._run_generation()
+        return self._gather()
+
+    def __call__(self, X):
+        return self.advance(X, 1)
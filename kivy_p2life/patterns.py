@@ -0,0 +1,216 @@
+"""Pattern library
+
+Patterns can be read from standard RLE and Life 1.06 files, as well as the
+lists in :class:`kivy_p2life.constants.Patterns`. When a pattern is added
+to a :class:`PatternLibrary`, every rotation of it is worked out once, with
+its population, so that finding the pattern for a rotated fiducial is just a
+table lookup.
+
+Patterns are indexed [x, y], like the grids, with y going up the screen; the
+rows of a pattern file go down the screen.
+
+Files in the ``patterns`` directory whose names start with a fiducial id,
+eg. ``5-lwss.rle``, are added to :data:`LIBRARY` and bound to that fiducial
+in :data:`kivy_p2life.constants.FIDUCIALS`.
+"""
+
+from collections import namedtuple
+import logging
+import os
+import re
+
+import numpy as np
+
+from .constants import FIDUCIALS, Types
+
+PATTERN_DIRECTORY = "patterns"
+
+_RLE_TOKEN = re.compile(r"(\d*)([a-zA-Z.$!])")
+_RLE_SIZE = re.compile(r"\b([xy])\s*=\s*(\d+)")
+_PATTERN_FILE = re.compile(r"^(\d+)\D.*\.(rle|lif|life)$", re.IGNORECASE)
+
+PatternRotation = namedtuple("PatternRotation", ["pattern", "popcount"])
+
+
+def _from_rows(rows):
+    """Turn rows of cells, top row first, into a pattern indexed [x, y]"""
+    return np.ascontiguousarray(np.asarray(rows, dtype=bool)[::-1].T)
+
+
+def parse_rle(text):
+    """Read a pattern in run length encoded format
+
+    >>> parse_rle("#N Glider\\nx = 3, y = 3, rule = B3/S23\\nbob$2bo$3o!").astype(int)
+    array([[1, 0, 0],
+           [1, 0, 1],
+           [1, 1, 0]])
+
+    Only the header's size is used, so any rule is accepted
+
+    >>> parse_rle("x = 2, y = 1, rule = B3/S23:T10,10\\no!").shape
+    (2, 1)
+    """
+    width = height = 0
+    rows = [[]]
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line.startswith("x"):
+            header = dict(_RLE_SIZE.findall(line))
+            width = int(header.get("x", 0))
+            height = int(header.get("y", 0))
+            continue
+        for count, tag in _RLE_TOKEN.findall(line):
+            count = int(count or 1)
+            if tag == "!":
+                break
+            elif tag == "$":
+                rows.extend([] for unused in range(count))
+            elif tag in "b.":
+                rows[-1].extend([False] * count)
+            else:
+                # Any other state counts as alive
+                rows[-1].extend([True] * count)
+        else:
+            continue
+        break
+    width = max([width] + [len(row) for row in rows])
+    height = max(height, len(rows))
+    cells = np.zeros((height, width), dtype=bool)
+    for y, row in enumerate(rows):
+        cells[y, :len(row)] = row
+    return _from_rows(cells)
+
+
+def parse_life106(text):
+    """Read a pattern in Life 1.06 format
+
+    >>> parse_life106("#Life 1.06\\n0 -1\\n1 0\\n-1 1\\n0 1\\n1 1").astype(int)
+    array([[1, 0, 0],
+           [1, 0, 1],
+           [1, 1, 0]])
+    """
+    coordinates = [tuple(int(value) for value in line.split())
+                   for line in text.splitlines()
+                   if line.strip() and not line.startswith("#")]
+    if not coordinates:
+        raise ValueError("Pattern has no live cells")
+    xs, ys = np.array(coordinates).T
+    cells = np.zeros((ys.max() - ys.min() + 1, xs.max() - xs.min() + 1),
+                     dtype=bool)
+    cells[ys - ys.min(), xs - xs.min()] = True
+    return _from_rows(cells)
+
+
+def read_pattern(path):
+    """Read a pattern from an RLE or Life 1.06 file"""
+    with open(path) as f:
+        text = f.read()
+    if text.startswith("#Life 1.06"):
+        return parse_life106(text)
+    return parse_rle(text)
+
+
+class PatternLibrary(object):
+
+    """Patterns bound to fiducial ids, with every rotation precomputed
+
+    >>> library = PatternLibrary()
+    >>> library.add(2, [[True, False], [True, True]])
+    >>> rotation = library.rotation(2, 3)
+    >>> rotation.pattern.astype(int)
+    array([[1, 1],
+           [0, 1]])
+    >>> rotation.popcount
+    3
+    >>> library.rotation(3, 0)
+    Traceback (most recent call last):
+    KeyError: 3
+    """
+
+    def __init__(self):
+        # Fiducial id -> its rotations, indexed by np.rot90's quarter turns
+        self._rotations = {}
+
+    @classmethod
+    def from_fiducials(cls, fiducials):
+        """Make a library of the patterns in a FIDUCIALS-style dict"""
+        library = cls()
+        for fid, (fid_type, pattern) in fiducials.items():
+            if fid_type == Types.PATTERN:
+                library.add(fid, pattern)
+        return library
+
+    def __contains__(self, fid):
+        return fid in self._rotations
+
+    def add(self, fid, pattern):
+        """Bind a pattern to a fiducial id"""
+        rotations = []
+        for turns in range(4):
+            rotated = np.ascontiguousarray(np.rot90(np.asarray(pattern,
+                                                               dtype=bool),
+                                                    turns))
+            # The same arrays are handed out every time
+            rotated.flags.writeable = False
+            rotations.append(PatternRotation(rotated,
+                                             int(np.count_nonzero(rotated))))
+        self._rotations[fid] = tuple(rotations)
+
+    def load(self, fid, path):
+        """Bind the pattern in an RLE or Life 1.06 file to a fiducial id"""
+        pattern = read_pattern(path)
+        self.add(fid, pattern)
+        return pattern
+
+    def load_directory(self, path, fiducials=None):
+        """ Load every pattern file whose name starts with a fiducial id
+
+        :param path: The directory to load
+        :param fiducials: If specified, bind the patterns in this
+            FIDUCIALS-style dict as well. Files named after a fiducial which
+            is already bound to something other than a pattern are skipped.
+
+        >>> import os, shutil, tempfile
+        >>> path = tempfile.mkdtemp()
+        >>> for name in ["5-blinker.rle", "101-blinker.rle"]:
+        ...     with open(os.path.join(path, name), "w") as f:
+        ...         f.write("x = 3, y = 1\\n3o!")
+        >>> fiducials = {101: (Types.EVENT_DISPATCHER, "ConfirmEventWhite")}
+        >>> library = PatternLibrary()
+        >>> library.load_directory(path, fiducials)
+        >>> sorted(fiducials.items())
+        [(5, ('pattern', [[True], [True], [True]])), (101, ('event dispatcher', 'ConfirmEventWhite'))]
+        >>> 101 in library
+        False
+        >>> shutil.rmtree(path)
+        """
+        for name in sorted(os.listdir(path)):
+            match = _PATTERN_FILE.match(name)
+            if match is None:
+                continue
+            fid = int(match.group(1))
+            fid_type = (fiducials or {}).get(fid, (Types.PATTERN, None))[0]
+            if fid_type != Types.PATTERN:
+                logging.warning("Skipping {}: fiducial {} isn't a pattern "
+                                "fiducial".format(name, fid))
+                continue
+            pattern = self.load(fid, os.path.join(path, name))
+            if fiducials is not None:
+                fiducials[fid] = (Types.PATTERN, pattern.tolist())
+
+    def rotation(self, fid, angle):
+        """ Find the pattern for a fiducial at an angle
+
+        :param fid: The fiducial id
+        :param angle: The fiducial's angle, in radians
+        """
+        rotations = self._rotations[fid]
+        # The nearest quarter turn, counted the opposite way to np.rot90
+        return rotations[-int(round(angle / (np.pi / 2))) % 4]
+
+
+LIBRARY = PatternLibrary.from_fiducials(FIDUCIALS)
+if os.path.isdir(PATTERN_DIRECTORY):
+    LIBRARY.load_directory(PATTERN_DIRECTORY, FIDUCIALS)
@@ -0,0 +1,291 @@
+"""Texture-based board rendering
+
+Instead of one widget (and a Color, Rectangle and Line) per cell, the whole
+board is drawn as a single texture with one texel per cell, scaled up with
+nearest-neighbour filtering.
+
+Drag previews are drawn separately by a :class:`PreviewLayer`, as lines
+around just the pattern's cells. Each preview is translated into place, so
+moving it doesn't touch the board or rebuild its lines.
+
+Patterns are drawn the same way, by :func:`pattern_texture`, which keeps
+the textures it makes in a :class:`TextureCache`.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from kivy.graphics import (Color, InstructionGroup, Line, PopMatrix,
+                           PushMatrix, Rectangle, Translate)
+from kivy.graphics.texture import Texture
+
+from kivy_grid_cells.constants import States, Colours
+
+_STATES = (States.ILLEGAL, States.DEACTIVATED, States.FIRST, States.SECOND)
+_OFFSET = -min(_STATES)
+
+
+def _rgba(colour):
+    colour = list(colour)
+    if len(colour) == 3:
+        colour.append(1)
+    return colour
+
+
+def make_palette():
+    """Map each state (offset so that States.ILLEGAL is 0) to RGBA bytes"""
+    palette = np.zeros((max(_STATES) + _OFFSET + 1, 4), dtype=np.uint8)
+    for state in _STATES:
+        palette[state + _OFFSET] = np.round(np.multiply(_rgba(Colours[state]),
+                                                        255))
+    return palette
+
+
+def cells_to_rgba(cells, palette):
+    """Turn a grid (indexed [x, y]) into rows of RGBA texels, bottom row
+    first, as Texture.blit_buffer expects
+
+    >>> palette = np.arange(16, dtype=np.uint8).reshape(4, 4)
+    >>> cells_to_rgba(np.array([[0, 1, 2]]), palette)[:, 0, 0]
+    array([ 4,  8, 12], dtype=uint8)
+    """
+    return np.ascontiguousarray(palette[np.asarray(cells).T + _OFFSET])
+
+
+class BoardRenderer(object):
+
+    """Draw a grid's cells as one texture
+
+    Parameters
+    ----------
+    canvas : Canvas
+        where the board is drawn
+    """
+
+    def __init__(self, canvas):
+        self.palette = make_palette()
+        self.texture = None
+        self._rectangle = Rectangle()
+        canvas.add(Color(1, 1, 1, 1))
+        canvas.add(self._rectangle)
+
+    def _ensure_texture(self, cols, rows):
+        if self.texture is None or self.texture.size != (cols, rows):
+            self.texture = Texture.create(size=(cols, rows), colorfmt="rgba")
+            self.texture.mag_filter = "nearest"
+            self.texture.min_filter = "nearest"
+            self._rectangle.texture = self.texture
+
+    def update(self, cells, pos, cell_size):
+        """Redraw the board
+
+        :param cells: The live grid, indexed [x, y]
+        :param pos: The position of the grid's bottom-left corner
+        :param cell_size: The size of each cell, in pixels
+        """
+        cols, rows = cells.shape
+        self._ensure_texture(cols, rows)
+        self.texture.blit_buffer(cells_to_rgba(cells, self.palette).tostring(),
+                                 colorfmt="rgba", bufferfmt="ubyte")
+        self._rectangle.pos = pos
+        self._rectangle.size = (cols * cell_size, rows * cell_size)
+
+
+class PreviewLayer(object):
+
+    """Draw drag previews as borders, independently of the board
+
+    Each preview is its own instruction group, covering only its pattern's
+    cells. Moving a preview just changes its translation; its lines are only
+    rebuilt when the pattern (or the cell size) changes.
+
+    Parameters
+    ----------
+    canvas : Canvas
+        where the previews are drawn, on top of the board
+
+    >>> from kivy.graphics import InstructionGroup
+    >>> layer = PreviewLayer(InstructionGroup())
+    >>> layer.show(1, np.array([[1, 0], [0, 1]]), (0, 0), 10)
+    >>> group = layer._previews[1][0]
+    >>> layer.show(1, np.array([[1, 0], [0, 1]]), (30, 20), 10)
+    >>> layer._previews[1][0] is group
+    True
+    >>> layer._previews[1][1].xy
+    (30, 20)
+    >>> layer.hide(1)
+    >>> layer._previews
+    {}
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        # Preview key -> (group, translation, pattern signature)
+        self._previews = {}
+
+    def _build(self, pattern, cell_size):
+        group = InstructionGroup()
+        translate = Translate()
+        group.add(PushMatrix())
+        group.add(translate)
+        for state in _STATES:
+            xs, ys = np.nonzero(pattern == state)
+            if state == States.DEACTIVATED or not len(xs):
+                continue
+            group.add(Color(*_rgba(Colours[state])))
+            for x, y in zip(xs, ys):
+                group.add(Line(rectangle=(x * cell_size, y * cell_size,
+                                          cell_size, cell_size)))
+        group.add(PopMatrix())
+        return group, translate
+
+    def show(self, key, pattern, pos, cell_size):
+        """Show a preview, or move it if it's already shown
+
+        :param key: Identifies the preview, eg. the touch's id
+        :param pattern: The previewed states, indexed [x, y]
+        :param pos: The position of the pattern's bottom-left corner
+        :param cell_size: The size of each cell, in pixels
+        """
+        pattern = np.asarray(pattern)
+        signature = (pattern.shape, pattern.tostring(), cell_size)
+        if key in self._previews and self._previews[key][2] != signature:
+            self.hide(key)
+        if key not in self._previews:
+            group, translate = self._build(pattern, cell_size)
+            self.canvas.add(group)
+            self._previews[key] = (group, translate, signature)
+        self._previews[key][1].xy = tuple(pos)
+
+    def hide(self, key):
+        """Remove a preview, if it's shown"""
+        if key in self._previews:
+            self.canvas.remove(self._previews.pop(key)[0])
+
+    def clear(self):
+        """Remove every preview"""
+        for key in list(self._previews):
+            self.hide(key)
+
+
+class TextureCache(object):
+
+    """Keep the most recently used textures, up to a limit
+
+    >>> cache = TextureCache(maxsize=2)
+    >>> cache.put("a", 1)
+    >>> cache.put("b", 2)
+    >>> cache.get("a")
+    1
+    >>> cache.put("c", 3)
+    >>> cache.get("b") is None
+    True
+    >>> sorted(cache.keys())
+    ['a', 'c']
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._textures = OrderedDict()
+
+    def get(self, key):
+        """Return the texture stored under key, or None"""
+        texture = self._textures.pop(key, None)
+        if texture is not None:
+            # Move it to the most recently used end
+            self._textures[key] = texture
+        return texture
+
+    def put(self, key, texture):
+        self._textures.pop(key, None)
+        self._textures[key] = texture
+        while len(self._textures) > self.maxsize:
+            self._textures.popitem(last=False)
+
+    def keys(self):
+        return self._textures.keys()
+
+
+_PATTERN_TEXTURES = TextureCache()
+# Texels along each side of a cell in a pattern's texture
+PATTERN_SCALE = 8
+
+
+def _canonical_rotation(pattern):
+    """Find the rotation of a pattern that its texture is drawn from
+
+    Returns the rotated pattern and how many quarter turns anticlockwise
+    (as np.rot90 turns) take it back to the given pattern, so that every
+    rotation of a pattern shares the same texture.
+
+    >>> pattern = np.array([[True, False], [True, True]])
+    >>> canonical, turns = _canonical_rotation(np.rot90(pattern))
+    >>> canonical, unused = _canonical_rotation(pattern)
+    >>> np.array_equal(np.rot90(canonical, turns), np.rot90(pattern))
+    True
+    """
+    candidates = []
+    for turns in range(4):
+        rotated = np.ascontiguousarray(np.rot90(pattern, -turns))
+        candidates.append((rotated.shape, rotated.tostring(), turns, rotated))
+    shape, data, turns, canonical = min(candidates, key=lambda c: c[:3])
+    return canonical, turns
+
+
+def pattern_texels(pattern, state, scale=PATTERN_SCALE):
+    """Draw a pattern's RGBA texels, bottom row first, with scale x scale
+    texels per cell
+
+    Live cells are filled with the player's colour and outlined in the other
+    player's, so that they show up on light and dark backgrounds alike.
+    Empty cells are see-through.
+
+    >>> texels = pattern_texels(np.array([[True, False]]), States.FIRST, 4)
+    >>> texels.shape
+    (8, 4, 4)
+    >>> texels[:, 0, 3]
+    array([255, 255, 255, 255,   0,   0,   0,   0], dtype=uint8)
+    >>> np.array_equal(texels[0, 0], texels[1, 1])
+    False
+    """
+    palette = make_palette()
+    palette[States.DEACTIVATED + _OFFSET] = 0
+    pattern = np.asarray(pattern, dtype=bool)
+    fill = cells_to_rgba(pattern.astype(int) * state, palette)
+    outline = cells_to_rgba(
+        pattern.astype(int) * (States.FIRST + States.SECOND - state), palette)
+    fill = np.repeat(np.repeat(fill, scale, axis=0), scale, axis=1)
+    outline = np.repeat(np.repeat(outline, scale, axis=0), scale, axis=1)
+    edge = np.zeros((scale, scale), dtype=bool)
+    edge[[0, -1], :] = True
+    edge[:, [0, -1]] = True
+    rows, cols = pattern.shape[1], pattern.shape[0]
+    edges = np.tile(edge, (rows, cols))
+    fill[edges] = outline[edges]
+    return np.ascontiguousarray(fill)
+
+
+def pattern_texture(pattern, state, cache=_PATTERN_TEXTURES):
+    """Draw a pattern in a player's colour, at PATTERN_SCALE texels per cell
+
+    Returns the texture and how many quarter turns anticlockwise it must be
+    shown at; patterns which are rotations of each other share a texture.
+
+    :param pattern: The pattern's live cells, indexed [x, y]
+    :param state: The player's state, eg. States.FIRST
+    :param cache: Where textures are kept between calls
+    """
+    canonical, turns = _canonical_rotation(np.asarray(pattern, dtype=bool))
+    key = (canonical.shape, canonical.tostring(), state)
+    texture = cache.get(key)
+    if texture is None:
+        texels = pattern_texels(canonical, state)
+        rows, cols = texels.shape[:2]
+        texture = Texture.create(size=(cols, rows), colorfmt="rgba")
+        texture.mag_filter = "nearest"
+        texture.min_filter = "nearest"
+        texture.blit_buffer(texels.tostring(), colorfmt="rgba",
+                            bufferfmt="ubyte")
+        cache.put(key, texture)
+    return texture, turns
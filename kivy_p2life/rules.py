@@ -0,0 +1,119 @@
+"""Rule definitions and lookup-table kernels
+
+A rule is a function from (own state, white neighbours, black neighbours) to
+the cell's next state. :class:`Rule` compiles it once into a lookup table, so
+a whole generation is a single fancy-index gather.
+"""
+
+import numpy as np
+
+from .constants import Colours
+from .gol import neighbour_count, resolve_births
+
+STATES = (Colours.EMPTY, Colours.WHITE, Colours.BLACK)
+MAX_NEIGHBOURS = 8
+
+
+def p2life(state, whites, blacks):
+    """The P2Life rules for a single cell
+
+    Returns Colours.UNKNOWN for a B/W birth, which needs a tie-break.
+
+    >>> p2life(Colours.EMPTY, 3, 1) == Colours.WHITE
+    True
+    >>> p2life(Colours.EMPTY, 3, 3) == Colours.UNKNOWN
+    True
+    >>> p2life(Colours.BLACK, 1, 2) == Colours.BLACK
+    True
+    """
+    if state == Colours.EMPTY:
+        if whites == 3:
+            return Colours.UNKNOWN if blacks == 3 else Colours.WHITE
+        return Colours.BLACK if blacks == 3 else Colours.EMPTY
+    diff = abs(whites - blacks)
+    if diff in (2, 3) or (diff == 1 and max(whites, blacks) >= 2):
+        return state
+    return Colours.EMPTY
+
+
+def life_like(birth, survival):
+    """Create a single-colour rule, eg. ``life_like([3], [2, 3])`` for B3/S23
+
+    Births are white, and only white neighbours are counted.
+    """
+    birth = frozenset(birth)
+    survival = frozenset(survival)
+
+    def _rule(state, whites, blacks):
+        if state == Colours.EMPTY:
+            return Colours.WHITE if whites in birth else Colours.EMPTY
+        return state if whites in survival else Colours.EMPTY
+
+    return _rule
+
+
+class Rule(object):
+
+    """A named rule which is compiled into a lookup table on first use
+
+    >>> P2LIFE.table.shape
+    (3, 9, 9)
+    >>> P2LIFE.table[Colours.EMPTY, 0, 3] == Colours.BLACK
+    True
+    """
+
+    def __init__(self, name, function):
+        self.name = name
+        self.function = function
+        self._table = None
+
+    def __repr__(self):
+        return "<Rule {}>".format(self.name)
+
+    @property
+    def table(self):
+        if self._table is None:
+            self._table = self.compile()
+        return self._table
+
+    def compile(self):
+        """Tabulate the rule for every state and neighbour count"""
+        counts = MAX_NEIGHBOURS + 1
+        table = np.zeros((len(STATES), counts, counts), dtype=int)
+        for state in STATES:
+            for whites in range(counts):
+                for blacks in range(counts - whites):
+                    table[state, whites, blacks] = \
+                        self.function(state, whites, blacks)
+        return table
+
+    def step(self, X, random_state=None):
+        """Evolve a board by one generation
+
+        :param random_state: RandomState or TieBreak used for B/W births
+
+        Simple evolution:
+
+        >>> P2LIFE.step(np.array([[1, 2, 1], [1, 2, 1], [1, 2, 1]]))
+        array([[1, 0, 1],
+               [1, 0, 1],
+               [1, 0, 1]])
+
+        B3/S23 spinner:
+
+        >>> CONWAY.step(np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]))
+        array([[0, 0, 0, 0, 0],
+               [0, 0, 1, 0, 0],
+               [0, 0, 1, 0, 0],
+               [0, 0, 1, 0, 0],
+               [0, 0, 0, 0, 0]])
+        """
+        X = np.asarray(X).astype(int)
+        white_nbrs = neighbour_count(X == Colours.WHITE)
+        black_nbrs = neighbour_count(X == Colours.BLACK)
+        new = self.table[X, white_nbrs, black_nbrs]
+        return resolve_births(new, random_state)
+
+
+P2LIFE = Rule("P2Life", p2life)
+CONWAY = Rule("B3/S23", life_like([3], [2, 3]))
@@ -0,0 +1,161 @@
+"""Active-tile P2Life engine
+
+The board is split into tiles, and only the tiles which could have changed
+are recomputed each generation. A cell can only change if something in its
+3x3 neighbourhood changed in the previous generation, so every changed cell
+marks the tiles containing it and its eight neighbours as active. The results
+are the same as :func:`kivy_p2life.gol.p2life_step`.
+"""
+
+import numpy as np
+
+from .constants import Colours
+from .gol import p2life_rule
+
+
+def _tile_starts(length, tile):
+    """Start offsets of the tiles along one axis
+
+    Tiles all have the same size; if the axis isn't a multiple of the tile
+    size, the last tile overlaps its neighbour.
+
+    >>> _tile_starts(10, 4)
+    [0, 4, 6]
+    >>> _tile_starts(8, 4)
+    [0, 4]
+    """
+    starts = list(range(0, length - tile, tile))
+    starts.append(length - tile)
+    return starts
+
+
+class TiledBoard(object):
+
+    """A P2Life board which only recomputes active tiles
+
+    Parameters
+    ----------
+    X : array_like
+        a two-dimensional numpy array showing the game board
+    tile_size : int
+        the side of each (square) tile
+    random_state : RandomState or TieBreak, optional
+        source of the B/W birth tie-breaks
+    """
+
+    def __init__(self, X, tile_size=16, random_state=None):
+        X = np.asarray(X)
+        assert X.ndim == 2
+        self.cells = X.astype(int)
+        self.random_state = random_state
+        rows, cols = X.shape
+        self.tile_shape = (min(tile_size, rows), min(tile_size, cols))
+        self._row_starts = np.array(_tile_starts(rows, self.tile_shape[0]))
+        self._col_starts = np.array(_tile_starts(cols, self.tile_shape[1]))
+        # Every tile is active until the first generation has run
+        self.active = np.ones((len(self._row_starts), len(self._col_starts)),
+                              dtype=bool)
+
+    def _tile_indices(self, tile_rows, tile_cols, halo):
+        """Row and column indices of the given tiles, with a wrapping halo
+
+        Returns arrays of shape (n, height + 2 * halo, 1) and
+        (n, 1, width + 2 * halo) suitable for fancy indexing.
+        """
+        height, width = self.tile_shape
+        rows = (self._row_starts[tile_rows][:, np.newaxis] +
+                np.arange(-halo, height + halo)) % self.cells.shape[0]
+        cols = (self._col_starts[tile_cols][:, np.newaxis] +
+                np.arange(-halo, width + halo)) % self.cells.shape[1]
+        return rows[:, :, np.newaxis], cols[:, np.newaxis, :]
+
+    def _mark_active(self, rows, cols):
+        """Activate the tiles around the given changed cells"""
+        n_rows, n_cols = self.active.shape
+        height, width = self.tile_shape
+        self.active[:] = False
+        for d_row in (-1, 0, 1):
+            tile_rows = np.minimum((rows + d_row) % self.cells.shape[0] //
+                                   height, n_rows - 1)
+            for d_col in (-1, 0, 1):
+                tile_cols = np.minimum((cols + d_col) % self.cells.shape[1] //
+                                       width, n_cols - 1)
+                self.active[tile_rows, tile_cols] = True
+
+    def step(self):
+        """Evolve the board by one generation
+
+        Returns the number of tiles that were recomputed.
+
+        >>> board = TiledBoard(np.zeros((12, 12)), tile_size=4)
+        >>> board.cells[1, 0:3] = Colours.WHITE
+        >>> board.step()
+        9
+        >>> board.step()
+        3
+        >>> board.cells[:4, :4]
+        array([[0, 0, 0, 0],
+               [1, 1, 1, 0],
+               [0, 0, 0, 0],
+               [0, 0, 0, 0]])
+        """
+        tile_rows, tile_cols = np.nonzero(self.active)
+        if not len(tile_rows):
+            return 0
+        height, width = self.tile_shape
+        rows, cols = self._tile_indices(tile_rows, tile_cols, halo=1)
+        windows = self.cells[rows, cols]
+
+        # Integer neighbour counts from the halo around each tile
+        whites = (windows == Colours.WHITE).astype(int)
+        blacks = (windows == Colours.BLACK).astype(int)
+        white_nbrs = np.zeros((len(tile_rows), height, width), dtype=int)
+        black_nbrs = np.zeros_like(white_nbrs)
+        for d_row in (0, 1, 2):
+            for d_col in (0, 1, 2):
+                if d_row == 1 and d_col == 1:
+                    continue
+                white_nbrs += whites[:, d_row:d_row + height,
+                                     d_col:d_col + width]
+                black_nbrs += blacks[:, d_row:d_row + height,
+                                     d_col:d_col + width]
+
+        old = windows[:, 1:-1, 1:-1]
+        rows, cols = rows[:, 1:-1, :], cols[:, :, 1:-1]
+        new = p2life_rule(old, white_nbrs, black_nbrs, self.random_state,
+                          coordinates=(rows, cols))
+        changed = np.nonzero(new != old)
+        self.cells[rows, cols] = new
+
+        # Board coordinates of every changed cell
+        tiles, tile_y, tile_x = changed
+        self._mark_active(rows[tiles, tile_y, 0], cols[tiles, 0, tile_x])
+        return len(tile_rows)
+
+
+def tiled_animation(X, tile_size=16, random_state=None):
+    """Produce a P2Life animation using the active-tile engine
+
+    Parameters
+    ----------
+    X : array_like
+        a two-dimensional numpy array showing the game board
+    tile_size : int
+        the side of each (square) tile
+    random_state : RandomState or TieBreak, optional
+        source of the B/W birth tie-breaks
+
+    >>> gen = tiled_animation(np.array([[1, 2, 1], [1, 2, 1], [1, 2, 1]]))
+    >>> gen.next()
+    array([[1, 0, 1],
+           [1, 0, 1],
+           [1, 0, 1]])
+    """
+    board = TiledBoard(X, tile_size, random_state)
+
+    def _iterate(board):
+        while True:
+            board.step()
+            yield board.cells.copy()
+
+    return _iterate(board)
@@ -0,0 +1,181 @@
+"""Unbounded P2Life boards
+
+An :class:`UnboundedBoard` only stores the region around its live cells,
+with everything outside it empty. The region is made of whole chunks: it
+grows when a live cell comes within one cell of its edge, and drops chunks
+which have emptied, so patterns can travel arbitrarily far without a huge
+torus being allocated up front. Cells are addressed by logical coordinates;
+``origin`` is the logical position of the stored region's first cell.
+"""
+
+import numpy as np
+
+from .constants import Colours
+from .gol import DEAD, neighbour_count, p2life_rule
+
+
+def _chunk_floor(value, chunk):
+    return value // chunk * chunk
+
+
+def _chunk_ceil(value, chunk):
+    return -(-value // chunk) * chunk
+
+
+class UnboundedBoard(object):
+
+    """A P2Life board with no edges
+
+    Parameters
+    ----------
+    X : array_like, optional
+        initial cells
+    origin : (int, int)
+        logical coordinates of X's first cell
+    chunk : int
+        the side of each (square) chunk of storage
+    random_state : RandomState or TieBreak, optional
+        source of the B/W birth tie-breaks; TieBreak hashes logical
+        coordinates
+
+    A glider keeps going past the edge of its starting chunk:
+
+    >>> board = UnboundedBoard([[0, 1, 0], [0, 0, 1], [1, 1, 1]], chunk=4)
+    >>> for unused in range(8):
+    ...     board.step()
+    >>> board.origin
+    (0, 0)
+    >>> board.window((2, 2), (3, 3))
+    array([[0, 1, 0],
+           [0, 0, 1],
+           [1, 1, 1]])
+    >>> board.cells.shape
+    (8, 8)
+    """
+
+    def __init__(self, X=None, origin=(0, 0), chunk=16, random_state=None):
+        self.chunk = chunk
+        self.random_state = random_state
+        self.origin = (0, 0)
+        self.cells = np.zeros((chunk, chunk), dtype=int)
+        if X is not None:
+            self.paste(X, origin)
+
+    @property
+    def bounds(self):
+        """Logical (top, left, bottom, right) of the stored region; bottom
+        and right are exclusive"""
+        top, left = self.origin
+        rows, cols = self.cells.shape
+        return (top, left, top + rows, left + cols)
+
+    def _resize(self, top, left, bottom, right):
+        """Store exactly the given logical region, keeping any cells which
+        are in both the old and the new region"""
+        if (top, left, bottom, right) == self.bounds:
+            return
+        cells = np.zeros((bottom - top, right - left), dtype=int)
+        old_top, old_left, old_bottom, old_right = self.bounds
+        y0, x0 = max(top, old_top), max(left, old_left)
+        y1, x1 = min(bottom, old_bottom), min(right, old_right)
+        if y0 < y1 and x0 < x1:
+            cells[y0 - top:y1 - top, x0 - left:x1 - left] = \
+                self.cells[y0 - old_top:y1 - old_top,
+                           x0 - old_left:x1 - old_left]
+        self.cells = cells
+        self.origin = (top, left)
+
+    def _fit(self):
+        """Resize to the chunks covering the live cells plus a one-cell
+        margin, so that stepping with dead edges is exact"""
+        rows, cols = np.nonzero(self.cells)
+        chunk = self.chunk
+        if not len(rows):
+            top, left = self.origin
+            self._resize(top, left, top + chunk, left + chunk)
+            return
+        top, left = self.origin
+        self._resize(_chunk_floor(top + rows.min() - 1, chunk),
+                     _chunk_floor(left + cols.min() - 1, chunk),
+                     _chunk_ceil(top + rows.max() + 2, chunk),
+                     _chunk_ceil(left + cols.max() + 2, chunk))
+
+    def paste(self, X, origin=(0, 0)):
+        """Overwrite the cells under X, growing the board to fit it
+
+        >>> board = UnboundedBoard(chunk=4)
+        >>> board.paste([[1, 2]], origin=(-1, 5))
+        >>> board.bounds
+        (-4, 0, 4, 8)
+        """
+        X = np.asarray(X)
+        assert X.ndim == 2
+        chunk = self.chunk
+        top, left = origin
+        bottom, right = top + X.shape[0], left + X.shape[1]
+        old_top, old_left, old_bottom, old_right = self.bounds
+        self._resize(_chunk_floor(min(top, old_top), chunk),
+                     _chunk_floor(min(left, old_left), chunk),
+                     _chunk_ceil(max(bottom, old_bottom), chunk),
+                     _chunk_ceil(max(right, old_right), chunk))
+        self.window_view(origin, X.shape)[...] = X
+
+    def window_view(self, origin, shape):
+        """A writable view of a region which must be inside the board"""
+        top = origin[0] - self.origin[0]
+        left = origin[1] - self.origin[1]
+        assert top >= 0 and left >= 0
+        return self.cells[top:top + shape[0], left:left + shape[1]]
+
+    def window(self, origin, shape):
+        """Copy a region of the board, which may extend beyond the cells
+        that are stored
+
+        >>> UnboundedBoard([[1, 2]], chunk=2).window((-1, 0), (2, 3))
+        array([[0, 0, 0],
+               [1, 2, 0]])
+        """
+        top, left = origin
+        bottom, right = top + shape[0], left + shape[1]
+        out = np.zeros(shape, dtype=int)
+        old_top, old_left, old_bottom, old_right = self.bounds
+        y0, x0 = max(top, old_top), max(left, old_left)
+        y1, x1 = min(bottom, old_bottom), min(right, old_right)
+        if y0 < y1 and x0 < x1:
+            out[y0 - top:y1 - top, x0 - left:x1 - left] = \
+                self.cells[y0 - old_top:y1 - old_top,
+                           x0 - old_left:x1 - old_left]
+        return out
+
+    def step(self):
+        """Evolve the board by one generation"""
+        self._fit()
+        cells = self.cells
+        top, left, bottom, right = self.bounds
+        coordinates = (np.arange(top, bottom)[:, np.newaxis],
+                       np.arange(left, right))
+        self.cells = p2life_rule(
+            cells, neighbour_count(cells == Colours.WHITE, DEAD),
+            neighbour_count(cells == Colours.BLACK, DEAD),
+            self.random_state, coordinates)
+
+
+def unbounded_animation(X, origin=(0, 0), chunk=16, random_state=None):
+    """Produce a P2Life animation of an unbounded board, seen through a
+    window the size of X
+
+    >>> gen = unbounded_animation(np.array([[0, 0, 0], [1, 1, 1], [0, 0, 0]]))
+    >>> gen.next()
+    array([[0, 1, 0],
+           [0, 1, 0],
+           [0, 1, 0]])
+    """
+    X = np.asarray(X)
+    board = UnboundedBoard(X, origin, chunk, random_state)
+
+    def _iterate(board):
+        while True:
+            board.step()
+            yield board.window(origin, X.shape)
+
+    return _iterate(board)
@@ -3,10 +3,8 @@
 from __future__ import division
 
 import functools
-from hashlib import md5
 from itertools import product
 import logging
-import os
 
 import numpy as np
 
@@ -19,11 +17,13 @@ from kivy.properties import (
     ListProperty,
     NumericProperty,
     ObjectProperty,
+    OptionProperty,
 )
 from kivy.uix.behaviors import ButtonBehavior, DragBehavior
 from kivy.uix.image import Image
 from kivy.uix.label import Label
 from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.relativelayout import RelativeLayout
 from kivy.uix.widget import Widget
 
 from kivy_grid_cells.constants import States, Colours
@@ -32,6 +32,18 @@ from kivy_grid_cells.widgets import GridCell, DrawableGrid
 
 from . import events
 from .exceptions import UnknownFiducialError, NoPiecesObjectForPlayer
+from .gol import population
+from .patterns import LIBRARY
+from .rendering import BoardRenderer, PreviewLayer, pattern_texture
+
+# GOLGrid render modes
+WIDGETS = "widgets"
+TEXTURE = "texture"
+
+
+def _count_pieces(grid):
+    """Count the pieces in a grid, not including illegal cells"""
+    return np.count_nonzero(grid > States.DEACTIVATED)
 
 
 def _get_root_widget():
@@ -45,12 +57,7 @@ class LimitedGridCell(GridCell):
 
     def should_ignore_touch(self):
         # TODO ignore touch when in TUIO-mode
-        if self.state == self.parent.selected_state:
-            return False
-        try:
-            return self.parent.get_player_pieces().pieces < 1
-        except NoPiecesObjectForPlayer:
-            return False
+        return not self.parent.can_toggle(self.state)
 
     def handle_touch(self):
         """ Flip the cell's state between on and off, then update player_pieces
@@ -62,10 +69,13 @@ class LimitedGridCell(GridCell):
         >>> cell.handle_touch()
         >>> cell.parent.get_player_pieces.return_value.update_pieces.call_args
         call(-1)
+        >>> cell.parent.cell_changed.called
+        True
         """
         if self.should_ignore_touch():
             return
         new_state = super(LimitedGridCell, self).handle_touch()
+        self.parent.cell_changed(self)
         if new_state == States.DEACTIVATED:
             value = 1
         else:
@@ -96,10 +106,8 @@ class TUIODragDropMixin(object):
         self.register_event_type("on_reset")
         self.register_event_type("on_admin_reset")
         super(TUIODragDropMixin, self).__init__(*args, **kwargs)
-        half_pi = np.pi / 2
-        self.rotation_array = np.array(
-            # [full circle, 3/4, half, 1/4, nothing]
-            [np.pi * 2, np.pi + half_pi, np.pi, half_pi, 0])
+        # Only the latest move of each fiducial is handled, once per frame
+        self._moves = events.MoveCoalescer(self._drag_touch)
 
     def touch_to_pattern(self, touch):
         """ Find the related pattern from the touch and return it
@@ -126,15 +134,15 @@ class TUIODragDropMixin(object):
         UnknownFiducialError: Mock event
         """
 
-        fid_type, pattern = FIDUCIALS.get(touch.fid, (None, None))
-        if fid_type != Types.PATTERN:
+        return self.touch_to_rotation(touch).pattern
+
+    def touch_to_rotation(self, touch):
+        """Find the touch's pattern in the library, with its popcount"""
+        try:
+            # Every rotation of the pattern is already in the library
+            return LIBRARY.rotation(touch.fid, touch.angle)
+        except KeyError:
             raise UnknownFiducialError(touch)
-        pattern = np.array(pattern)
-        # Use the (radian) angle to find out optimum rotation. This uses the
-        # index of self.rotation_array, eg. array[2] == np.pi (180deg); to
-        # rotate 180deg, rot90 needs to be called with argument 2.
-        rotations = np.abs(self.rotation_array - touch.angle).argmin()
-        return np.rot90(pattern, rotations)
 
     @_require_fiducial
     def on_touch_down(self, touch):
@@ -192,6 +200,7 @@ class TUIODragDropMixin(object):
 
     @_require_fiducial
     def on_touch_up(self, touch):
+        self._moves.flush(touch.id)
         if not self.collide_point(*touch.pos):
             # Remove associated shape
             self.clear_grid_for_event(self.PREVIEW_GRID, touch)
@@ -203,6 +212,9 @@ class TUIODragDropMixin(object):
     def on_touch_move(self, touch):
         """ TUIO touch move event
 
+        The move is handled on the next frame, unless the touch moves again
+        first.
+
         No fiducial
 
         >>> import mock
@@ -213,9 +225,14 @@ class TUIODragDropMixin(object):
         Pattern fiducial
 
         >>> events.CustomEvent.dispatch = mock.Mock()
+        >>> thing.on_touch_move(mock.Mock(id=100, fid=2, pos=(5, 5), angle=0))
+        False
         >>> thing.on_touch_move(mock.Mock(id=100, fid=2, pos=(0, 0), angle=0))
         False
         >>> events.DragShapeEvent.dispatch.call_count
+        0
+        >>> thing._moves.flush()
+        >>> events.DragShapeEvent.dispatch.call_count
         1
         >>> events.DragShapeEvent.dispatch.call_args == [(thing, ), {}]
         True
@@ -226,22 +243,27 @@ class TUIODragDropMixin(object):
 
         >>> thing.on_touch_move(mock.Mock(fid=234, pos=(0, 0), angle=0))
         False
+        >>> thing._moves.flush()
         >>> logging.root._log.call_count
         1
         >>> logging.root._log.call_args
         call(30, 'Unrecognised fiducial 234 on move', ())
         """
+        self._moves.move(touch)
+        return False
+
+    def _drag_touch(self, touch):
         if not self.collide_point(*touch.pos):
             return False
         try:
-            pattern = self.touch_to_pattern(touch)
+            rotation = self.touch_to_rotation(touch)
         except UnknownFiducialError:
             logging.warning("Unrecognised fiducial {} on move".format(touch.fid))
             return False
-        events.DragShapeEvent(pattern, touch).dispatch(self)
+        events.DragShapeEvent(rotation.pattern, touch,
+                              rotation.popcount).dispatch(self)
         self.pattern_locations[touch.id] = \
-            self.cell_coordinates(touch.pos) + pattern.shape
-        return False
+            self.cell_coordinates(touch.pos) + rotation.pattern.shape
 
     def clear_grid_for_event(self, grid_index, evt):
         if evt.id not in self.pattern_locations:
@@ -454,16 +476,272 @@ class GOLGrid(TUIODragDropMixin, DrawableGrid):
 
     player_uis = ListProperty()
     player_pieces = ListProperty()  # TODO a better way to get player_pieces
+    # WIDGETS draws each cell as its own widget; TEXTURE draws the whole
+    # board as a single texture, which scales to much bigger boards
+    render_mode = OptionProperty(WIDGETS, options=[WIDGETS, TEXTURE])
 
     def __init__(self, *args, **kwargs):
         self.register_event_type("on_drag_shape")
         self.register_event_type("on_drop_shape")
         super(GOLGrid, self).__init__(*args, **kwargs)
+        # Running count of each player's cells
+        self.populations = None
+        self._pending_deltas = None
+        self._renderer = None
+        # Cell widgets by (y, x) and vice versa, and the cells they now show
+        self._cell_widgets = {}
+        self._cell_indices = {}
+        self._shown = None
+        # Drag previews are drawn over the cells, keyed by touch id
+        self.preview_layer = PreviewLayer(self.canvas.after)
+        self._preview_pieces = None
+        # The region of the preview grid each touch last drew on
+        self._preview_footprints = {}
+
+    def init_cells(self):
+        self.populations = None
+        self._pending_deltas = None
+        self._cell_widgets = {}
+        self._cell_indices = {}
+        self._shown = None
+        self._preview_pieces = None
+        self._preview_footprints = {}
+        super(GOLGrid, self).init_cells()
+        if self.render_mode != TEXTURE:
+            return
+        # The board is drawn as a texture and clicked cells are found by
+        # position, so there's no need for a widget per cell
+        for child in [child for child in self.children
+                      if isinstance(child, GridCell)]:
+            self.remove_widget(child)
+        if self._renderer is None:
+            self._renderer = BoardRenderer(self.canvas)
+            self.bind(pos=self._redraw, size=self._redraw)
+        self.update_cell_widgets()
+
+    def _redraw(self, *args):
+        self.update_cell_widgets()
+
+    def update_cell_widgets(self):
+        """ Bring the displayed board up to date with the live grid
+
+        Only the cells whose state has changed since the last update are
+        pushed to their widgets. Drag previews are drawn by preview_layer.
+
+        >>> import mock
+        >>> grid = GOLGrid(rows=3, cols=1, num_grids=2)
+        >>> grid.init_cells()
+        >>> grid.update_cell_widgets()
+        >>> grid.set_cell_state = mock.Mock()
+        >>> with grid._writable_grid(grid.CELLS_GRID):
+        ...     grid.grids[grid.CELLS_GRID][0, 2] = States.FIRST
+        >>> grid.update_cell_widgets()
+        >>> grid.set_cell_state.call_count
+        1
+        """
+        if self._renderer is None:
+            return self._update_changed_widgets()
+        self._renderer.update(self.cells, self._canvas_origin(),
+                              self.cell_size)
+
+    def _canvas_origin(self):
+        # A RelativeLayout draws its canvas relative to its own position
+        return (0, 0) if isinstance(self, RelativeLayout) else self.pos
+
+    def _update_changed_widgets(self):
+        cells = np.asarray(self.cells)
+        if (self._shown is None or self._shown.shape != cells.shape or
+                len(self._cell_widgets) != cells.size):
+            # Full refresh, which also fills in self._cell_widgets
+            super(GOLGrid, self).update_cell_widgets()
+        else:
+            for y, x in zip(*np.nonzero(cells != self._shown)):
+                self.set_cell_state(self._cell_widgets[y, x], y, x)
+        self._shown = cells.copy()
 
     def set_cell_state(self, cell, y, x):
+        self._cell_widgets[y, x] = cell
+        self._cell_indices[cell] = (y, x)
         super(GOLGrid, self).set_cell_state(cell, y, x)
-        grid = self.grids[self.PREVIEW_GRID]
-        cell.set_border_state(grid[y, x])
+
+    def cell_changed(self, cell):
+        """ Note that a cell widget has changed itself and the live grid
+
+        A clicked cell must not be skipped the next time the board is
+        updated, even if the engine turns it back into what was shown before
+        it was clicked.
+
+        >>> import mock
+        >>> EventLoop.window = mock.Mock(children=[mock.Mock(player=1)])
+        >>> grid = GOLGrid(rows=3, cols=1, num_grids=2)
+        >>> grid.player_pieces.append(mock.Mock(pieces=1))
+        >>> grid.init_cells()
+        >>> grid.update_cell_widgets()
+        >>> grid.selected_state = States.FIRST
+        >>> cell = grid._cell_widgets[0, 2]
+        >>> cell.handle_touch()
+        >>> cell.state == States.FIRST
+        True
+
+        The cell dies in the next generation
+
+        >>> grid.cells = np.zeros((1, 3), dtype=int)
+        >>> grid.update_cell_widgets()
+        >>> cell.state == States.DEACTIVATED
+        True
+        """
+        # The cell was changed in place, so count the populations again
+        self.populations = None
+        index = self._cell_indices.get(cell)
+        if self._shown is not None and index is not None:
+            self._shown[index] = cell.state
+        else:
+            self._shown = None
+
+    def can_toggle(self, state):
+        """Whether a cell in the given state may be clicked by the player"""
+        if state == self.selected_state:
+            # Taking a piece back is always allowed
+            return True
+        try:
+            return self.get_player_pieces().pieces >= 1
+        except NoPiecesObjectForPlayer:
+            return True
+
+    def toggle_cell(self, x, y):
+        """ Flip a cell between on and off, without a cell widget, then
+        update player_pieces
+
+        >>> import mock
+        >>> EventLoop.window = mock.Mock(children=[mock.Mock(player=1)])
+        >>> grid = GOLGrid(rows=3, cols=1, num_grids=2, render_mode=TEXTURE)
+        >>> grid.player_pieces.append(mock.Mock(pieces=1))
+        >>> grid.init_cells()
+        >>> [child for child in grid.children if isinstance(child, GridCell)]
+        []
+        >>> grid.selected_state = States.FIRST
+        >>> grid.toggle_cell(0, 2)
+        >>> grid.cells
+        array([[0, 0, 1]])
+        >>> grid.player_pieces[0].update_pieces.call_args
+        call(-1)
+        >>> grid.toggle_cell(0, 2)
+        >>> grid.cells
+        array([[0, 0, 0]])
+        >>> grid.player_pieces[0].update_pieces.call_args
+        call(1)
+        """
+        grid = self.grids[self.CELLS_GRID]
+        state = grid[x, y]
+        if not self.can_toggle(state):
+            return
+        if state == self.selected_state:
+            new_state = States.DEACTIVATED
+            value = 1
+        else:
+            new_state = self.selected_state
+            value = -1
+        with self._writable_grid(self.CELLS_GRID):
+            grid[x, y] = new_state
+        # The cell was changed in place, so count the populations again
+        self.populations = None
+        self.update_cell_widgets()
+        try:
+            self.get_player_pieces().update_pieces(value)
+        except NoPiecesObjectForPlayer:
+            pass
+
+    def on_touch_down(self, touch):
+        if (self._renderer is not None and not hasattr(touch, "fid") and
+                self.collide_point(*touch.pos)):
+            # There are no cell widgets to handle the touch
+            self.toggle_cell(*self.cell_coordinates(touch.pos))
+            return True
+        return super(GOLGrid, self).on_touch_down(touch)
+
+    def show_preview(self, evt, pattern, adj_x, adj_y):
+        """ Draw an event's preview pattern with its first cell at (adj_x,
+        adj_y), without touching the cell widgets """
+        cell_size = self.cell_size
+        left, bottom = self._canvas_origin()
+        self.preview_layer.show(evt.id, pattern,
+                                (left + adj_x * cell_size,
+                                 bottom + adj_y * cell_size),
+                                cell_size)
+
+    @property
+    def preview_pieces(self):
+        """ The number of pieces on the preview grid, not including illegal
+        cells
+
+        This is a running count, kept up to date as previews are drawn and
+        cleared; anything else which writes to the preview grid should set
+        _preview_pieces to None so that it's counted again.
+
+        >>> grid = GOLGrid(rows=3, cols=1, num_grids=2)
+        >>> grid.init_cells()
+        >>> with grid._writable_grid(grid.PREVIEW_GRID):
+        ...     grid.grids[grid.PREVIEW_GRID][0] = [1, -1, 1]
+        >>> grid.preview_pieces
+        2
+        """
+        if self._preview_pieces is None:
+            self._preview_pieces = _count_pieces(self.grids[self.PREVIEW_GRID])
+        return self._preview_pieces
+
+    def clear_grid_for_event(self, grid_index, evt):
+        """ Clear the preview drawn for a touch, whatever its input source
+
+        >>> import mock
+        >>> EventLoop.window = mock.Mock(children=[mock.Mock(player=1)])
+        >>> grid = GOLGrid(rows=3, cols=1, num_grids=2)
+        >>> grid.player_pieces.append(mock.Mock(pieces=1))
+        >>> grid.init_cells()
+        >>> event = mock.Mock(id=7, pattern=np.array([[True]]), popcount=1,
+        ...                   pos=(0, 0))
+        >>> grid.drag_or_drop_shape(event, 1, tolerate_illegal=True)
+        >>> grid._preview_footprints
+        {7: (0, 0, 1, 1)}
+        >>> grid.clear_grid_for_event(grid.PREVIEW_GRID, event)
+        >>> grid.grids[grid.PREVIEW_GRID]
+        array([[0, 0, 0]])
+        >>> grid.preview_pieces
+        0
+        """
+        if grid_index != self.PREVIEW_GRID:
+            return super(GOLGrid, self).clear_grid_for_event(grid_index, evt)
+        self.preview_layer.hide(evt.id)
+        footprint = self._preview_footprints.pop(evt.id, None)
+        if footprint is None:
+            # Not drawn by drag_or_drop_shape, so count again next time
+            self._preview_pieces = None
+            return super(GOLGrid, self).clear_grid_for_event(grid_index, evt)
+        adj_x, adj_y, x, y = footprint
+        with self._writable_grid(grid_index):
+            region = self.grids[grid_index][adj_x:adj_x + x, adj_y:adj_y + y]
+            if self._preview_pieces is not None:
+                self._preview_pieces -= _count_pieces(region)
+            region[...] = States.DEACTIVATED
+
+    def clear_grid(self, grid_index):
+        """ Clear a grid
+
+        >>> grid = GOLGrid(rows=3, cols=1, num_grids=2)
+        >>> grid.init_cells()
+        >>> grid.populations = {1: 2, 2: 0}
+        >>> grid.clear_grid(grid.CELLS_GRID)
+        >>> grid.populations is None
+        True
+        """
+        if grid_index == self.CELLS_GRID:
+            # Don't carry the old board's counts over
+            self.populations = None
+            self._pending_deltas = None
+        elif grid_index == self.PREVIEW_GRID:
+            self.preview_layer.clear()
+            self._preview_pieces = 0
+            self._preview_footprints = {}
+        return super(GOLGrid, self).clear_grid(grid_index)
 
     def get_player_ui(self, number):
         for ui in self.player_uis:
@@ -487,13 +765,16 @@ class GOLGrid(TUIODragDropMixin, DrawableGrid):
         >>> grid = GOLGrid(rows=3, cols=1, num_grids=2)
         >>> grid.player_pieces.append(mock.Mock(pieces=1))
         >>> grid.init_cells()
-        >>> event = mock.Mock(pattern=np.array([[True]]), pos=(0, 0))
+        >>> event = mock.Mock(pattern=np.array([[True]]), popcount=1, pos=(0, 0))
 
-        Put shape on live grid
+        Put shape on live grid; the populations will be counted again
 
+        >>> grid.populations = {1: 0, 2: 0}
         >>> grid.drag_or_drop_shape(event, 0, tolerate_illegal=False)
         >>> grid.grids
         [array([[1, 0, 0]]), array([[0, 0, 0]])]
+        >>> grid.populations is None
+        True
 
         Illegal shape on preview grid
 
@@ -519,8 +800,12 @@ class GOLGrid(TUIODragDropMixin, DrawableGrid):
             player_pieces = None
 
         grid = self.grids[grid_index]
-        counters = np.count_nonzero(grid[grid != States.ILLEGAL])
-        counters += np.count_nonzero(pattern)
+        if grid_index == self.PREVIEW_GRID:
+            # The event's old preview has already been cleared
+            counters = self.preview_pieces
+        else:
+            counters = _count_pieces(grid)
+        counters += evt.popcount
         overlaps = (self._cells[adj_x:adj_x_end, adj_y:adj_y_end]
                     != States.DEACTIVATED)
         if (player_pieces and counters > player_pieces.pieces) or overlaps.any():
@@ -529,11 +814,20 @@ class GOLGrid(TUIODragDropMixin, DrawableGrid):
                 np.core.multiarray.copyto(pattern, States.ILLEGAL,
                                           casting="unsafe")
             else:
-                self.update_cell_widgets()  # Clear any existing pattern
+                # Any existing preview was cleared with the grid
                 return
         with self._writable_grid(grid_index):
-            grid[adj_x:adj_x_end, adj_y:adj_y_end] = pattern
-        if grid_index == self.CELLS_GRID and player_pieces:
+            region = grid[adj_x:adj_x_end, adj_y:adj_y_end]
+            replaced = _count_pieces(region)
+            region[...] = pattern[:region.shape[0], :region.shape[1]]
+        if grid_index == self.PREVIEW_GRID:
+            self._preview_pieces += _count_pieces(region) - replaced
+            self._preview_footprints[evt.id] = (adj_x, adj_y) + region.shape
+            self.show_preview(evt, region, adj_x, adj_y)
+            return
+        # The cells were changed in place, so count the populations again
+        self.populations = None
+        if player_pieces:
             player_pieces.update_pieces(-counters)
         self.update_cell_widgets()
 
@@ -547,10 +841,21 @@ class GOLGrid(TUIODragDropMixin, DrawableGrid):
     def on_drop_shape(self, evt):
         self.clear_grid_for_event(self.PREVIEW_GRID, evt)
         if not self.collide_point(*evt.pos):
-            self.update_cell_widgets()  # Clear any existing pattern
             return False
         return self.drag_or_drop_shape(evt, self.CELLS_GRID)
 
+    def apply_deltas(self, deltas):
+        """ Update the population counts with the next cells update
+
+        :param deltas: Each player's (births, deaths), as counted by the
+            engine that produced the new cells
+        :type deltas dict:
+
+        The next time the cells change, the counts are adjusted instead of
+        being recounted from the board.
+        """
+        self._pending_deltas = deltas
+
     def on_cells_updated(self):
         """ Update player scores with new values
 
@@ -565,13 +870,30 @@ class GOLGrid(TUIODragDropMixin, DrawableGrid):
         2
         >>> grid.player_uis[1].score
         1
+
+        With the engine's deltas, the board isn't scanned:
+
+        >>> grid.apply_deltas({1: (0, 2), 2: (1, 0)})
+        >>> grid.on_cells_updated()
+        >>> grid.player_uis[0].score
+        0
+        >>> grid.player_uis[1].score
+        2
         """
-        cells = self.cells
+        deltas, self._pending_deltas = self._pending_deltas, None
+        if deltas is None or self.populations is None:
+            # The cells were changed by something other than the engine
+            self.populations = population(self.cells)
+        else:
+            for number, (births, deaths) in deltas.items():
+                self.populations[number] += births - deaths
         for ui in self.player_uis:
-            ui.score = np.count_nonzero(cells == ui.number)
+            ui.score = self.populations[ui.number]
 
     def get_new_pieces_for_player(self, player):
-        return np.count_nonzero(self.cells == player) // 3
+        if self.populations is None:
+            self.populations = population(self.cells)
+        return self.populations[player] // 3
 
 
 class PlayerUI(Label):
@@ -624,13 +946,25 @@ class RotatedImage(Image):
 class PatternVisualisation(DragBehavior, ButtonBehavior, RotatedImage):
 
     original_position = ListProperty()
+    # The player whose colour the pattern is shown in
+    player = NumericProperty(States.FIRST)
+
+    def __init__(self, *args, **kwargs):
+        super(PatternVisualisation, self).__init__(*args, **kwargs)
+        # Only drag the preview once per frame, however often it moves
+        self._moves = events.MoveCoalescer(self._drag_touch)
 
     def show_pattern(self, pattern):
-        # TODO autogenerate assets
-        # TODO different assets for different players
-        # TODO asset caching (if possible)
-        digest = md5(np.array_str(pattern)).hexdigest()
-        self.source = os.path.join("assets", "{}.png".format(digest))
+        """ Show the pattern in the player's colour
+
+        Rotations of a pattern share a texture, which is turned to match.
+        """
+        self.texture, turns = pattern_texture(pattern, self.player)
+        self.angle = 90 * turns
+
+    def on_player(self, instance, player):
+        if self.parent is not None and self.parent.pattern is not None:
+            self.show_pattern(self.parent.pattern)
 
     def setup(self):
         assert self.parent.pattern is not None, "parent.pattern is not set!"
@@ -641,25 +975,30 @@ class PatternVisualisation(DragBehavior, ButtonBehavior, RotatedImage):
 
     def on_touch_move(self, touch):
         if super(PatternVisualisation, self).on_touch_move(touch):
-            evt = events.DragShapeEvent(self.parent.pattern, touch)
-            evt.dispatch(_get_root_widget())
+            self._moves.move(touch)
             return True
         return False
 
+    def _drag_touch(self, touch):
+        evt = events.DragShapeEvent(self.parent.pattern, touch,
+                                    self.parent.popcount)
+        evt.dispatch(_get_root_widget())
+
     def on_touch_up(self, touch):
+        self._moves.flush(touch.id)
         if super(PatternVisualisation, self).on_touch_up(touch):
             self.pos = self.original_position
-            evt = events.DropShapeEvent(self.parent.pattern, touch)
+            evt = events.DropShapeEvent(self.parent.pattern, touch,
+                                        self.parent.popcount)
             evt.dispatch(_get_root_widget())
             return True
         return False
 
     def on_release(self):
-        with self.canvas:
-            self.angle -= 90
         # For some reason np.rot90 rotates anti-clockwise, so we need to call
         # it with argument 3 (to rotate 270 degrees instead of 90)
         self.parent.pattern = np.rot90(self.parent.pattern, 3)
+        self.show_pattern(self.parent.pattern)
 
 
 class CellShape(BoxLayout):
@@ -669,6 +1008,8 @@ class CellShape(BoxLayout):
     def __init__(self, *args, **kwargs):
         super(CellShape, self).__init__(*args, **kwargs)
         self._pattern = None
+        # Live cells in the pattern, which turning it doesn't change
+        self.popcount = 0
 
     @property
     def pattern(self):
@@ -682,6 +1023,7 @@ class CellShape(BoxLayout):
         else:
             pattern = np.array(pattern)
         self._pattern = pattern
+        self.popcount = int(np.count_nonzero(pattern))
 
     def setup(self):
         self.visualisation = PatternVisualisation(size=self.size)
@@ -0,0 +1,151 @@
+"""Background evolution
+
+:class:`FrameWorker` runs a generator of frames on a background thread and
+keeps a bounded queue of finished frames, so the Kivy main thread only has
+to take them off the queue and display them. Computing the next generation
+overlaps with drawing the current one. :class:`FramePacer` decides how many
+frames each display tick should take.
+"""
+
+from Queue import Empty, Full, Queue
+import threading
+import traceback
+
+_DONE = object()
+
+
+class FrameWorker(object):
+
+    """Produce frames on a background thread
+
+    Parameters
+    ----------
+    frames : iterator
+        the frames to produce; it is only used by the worker thread
+    maxsize : int
+        the most frames to compute ahead of the display
+    threaded : bool
+        if False, frames are computed on demand by :meth:`get` instead
+
+    >>> worker = FrameWorker(iter(range(3)), maxsize=2)
+    >>> worker.start()
+    >>> [worker.get(timeout=1) for i in range(3)]
+    [0, 1, 2]
+    >>> worker.get(timeout=1)
+    Traceback (most recent call last):
+    StopIteration
+    """
+
+    def __init__(self, frames, maxsize=4, threaded=True):
+        self.frames = frames
+        self.threaded = threaded
+        self.queue = Queue(maxsize)
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.threaded:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+
+    def stop(self):
+        """Abandon any frames which haven't been produced yet"""
+        self._stopped.set()
+
+    def join(self, timeout=None):
+        """ Wait for the worker thread to finish, after :meth:`stop`
+
+        The frame being produced, if any, is finished first.
+
+        >>> import itertools
+        >>> worker = FrameWorker(itertools.count(), maxsize=1)
+        >>> worker.start()
+        >>> worker.stop()
+        >>> worker.join()
+        >>> worker._thread.is_alive()
+        False
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _put(self, item):
+        """Queue an item, waiting for space unless the worker is stopped"""
+        while not self._stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+            except Full:
+                continue
+            return True
+        return False
+
+    def _run(self):
+        try:
+            for frame in self.frames:
+                if not self._put((frame, None)):
+                    return
+        except Exception:
+            self._put((None, traceback.format_exc()))
+        else:
+            self._put((_DONE, None))
+
+    def get(self, timeout=0):
+        """Return the next frame, or None if it isn't ready yet
+
+        Raises StopIteration once every frame has been returned, or
+        RuntimeError if producing a frame failed.
+
+        >>> def frames():
+        ...     yield 1
+        ...     raise ValueError("Oops")
+        >>> worker = FrameWorker(frames(), threaded=False)
+        >>> worker.get()
+        1
+        >>> worker.get()
+        Traceback (most recent call last):
+        ValueError: Oops
+        """
+        if not self.threaded:
+            return next(self.frames)
+        try:
+            frame, error = self.queue.get(timeout=timeout)
+        except Empty:
+            return None
+        if error is not None:
+            raise RuntimeError("Evolution failed:\n{}".format(error))
+        if frame is _DONE:
+            raise StopIteration
+        return frame
+
+
+class FramePacer(object):
+
+    """Work out how many frames are due, to keep a steady frame rate
+
+    Time is measured by adding up the intervals between ticks, so late
+    ticks don't add up to drift: a tick which comes too late makes more
+    frames due, and all but the last of them can be skipped.
+
+    >>> pacer = FramePacer(speed=10)
+    >>> pacer.due(0)
+    1
+    >>> pacer.taken += 1
+    >>> pacer.due(0.1)
+    1
+    >>> pacer.taken += 1
+    >>> pacer.due(0.3)
+    3
+    """
+
+    def __init__(self, speed):
+        self.speed = speed
+        self.elapsed = 0
+        self.taken = 0
+
+    def due(self, dt):
+        """Move the clock on by dt seconds and return how many frames
+        should be taken now"""
+        self.elapsed += dt
+        # Round, so that ticks which are a little early still get a frame
+        target = int(self.elapsed * self.speed + 0.5) + 1
+        return max(target - self.taken, 0)
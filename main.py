@@ -3,7 +3,6 @@
 from __future__ import division
 
 from ConfigParser import NoSectionError, NoOptionError
-from functools import partial
 
 import kivy
 kivy.require('1.8.1')
@@ -23,10 +22,18 @@ from kivy.properties import (
 
 from kivy_grid_cells.constants import Colours
 from kivy_p2life.constants import Colours as Players
+from kivy_p2life.engines import AUTO, create_engine
 from kivy_p2life.exceptions import NoPiecesObjectForPlayer
-from kivy_p2life.events import propagate_events
-from kivy_p2life.gol import life_animation
+from kivy_p2life.events import EventRouter
+from kivy_p2life.gol import (
+    UNBOUNDED,
+    WRAP,
+    CycleDetector,
+    advance,
+    life_animation,
+)
 from kivy_p2life.utils import Player
+from kivy_p2life.worker import FramePacer, FrameWorker
 
 
 class CustomLayoutMixin(object):
@@ -37,18 +44,24 @@ class CustomLayoutMixin(object):
     shapes = ObjectProperty(None)
     end_turn_button = ObjectProperty(None)
     interactions_enabled = BooleanProperty(True)
+    # Period of the cycle which ended the last evolution early, if any
+    cycle_period = ObjectProperty(None, allownone=True)
+    # Generations computed but not shown in the last evolution, to keep up
+    # with the game speed
+    frames_dropped = NumericProperty(0)
 
     def __init__(self, *args, **kwargs):
         self.register_event_type("on_drag_shape")
         self.register_event_type("on_drop_shape")
         super(CustomLayoutMixin, self).__init__(*args, **kwargs)
         self._player = None
+        self._router = EventRouter(self)
 
     def on_drag_shape(self, evt):
-        return propagate_events(self, "on_drag_shape", evt)
+        return self._router.dispatch("on_drag_shape", evt)
 
     def on_drop_shape(self, evt):
-        return propagate_events(self, "on_drop_shape", evt)
+        return self._router.dispatch("on_drop_shape", evt)
 
     def disable_interaction(self):
         self.interactions_enabled = False
@@ -67,6 +80,10 @@ class CustomLayoutMixin(object):
             self.end_turn_button.background_color = Colours[player]
         self.player = player
         self.grid.selected_state = player
+        if self.shapes:
+            for shape in self.shapes.children:
+                if shape.visualisation is not None:
+                    shape.visualisation.player = player
         new_pieces = max(self.app.minimum_pieces,
                          self.grid.get_new_pieces_for_player(player))
         try:
@@ -82,7 +99,7 @@ class CustomLayoutMixin(object):
         # Override this method on a per-UI basis
         pass
 
-    def evolve(self, iterations, speed, callback=None):
+    def evolve(self, iterations, speed, callback=None, animate=True):
         """ Evolve the grid multiple times
 
         :param iterations: Number of times to evolve
@@ -91,32 +108,188 @@ class CustomLayoutMixin(object):
         :type speed int:
         :param callback: Function to call after evolving
         :type callback function:
+        :param animate: If False, jump straight to the final generation and
+            only update the grid once
+        :type animate bool:
+
+        If the board settles into a still life or a short cycle (without
+        needing a B/W birth tie-break), the remaining generations are skipped
+        and the grid jumps to the matching phase of the cycle. Unbounded
+        boards are never cut short, as the grid only shows part of them.
 
         >>> import mock
         >>> from kivy.uix.widget import Widget
-        >>> Clock.schedule_once = lambda func, timeout: func()
+        >>> def run_clock(func, interval):
+        ...     while func(interval) is not False:
+        ...         pass
+        >>> Clock.schedule_interval = run_clock
         >>> thing = type("Thing", (CustomLayoutMixin, Widget), {})()
-        >>> thing.grid = mock.Mock(cells=[[]])
+        >>> import numpy as np
+        >>> thing.grid = mock.Mock(cells=np.zeros((3, 3), dtype=int))
         >>> callback = mock.Mock()
         >>> with mock.patch("kivy_p2life.gol.life_step") as life_step:
+        ...     life_step.side_effect = lambda X: X + 1
         ...     thing.evolve(10, 0.001, callback)
         >>> life_step.call_count
         10
         >>> callback.call_count
         1
-        """
-        anim = life_animation(self.grid.cells)
+        >>> thing.cycle_period is None
+        True
 
-        def _update(dt=None, remaining=0):
-            self.grid.cells = anim.next()
-            remaining -= 1
-            if remaining:
-                Clock.schedule_once(partial(_update, remaining=remaining),
-                                    timeout=(1 / speed))
-            elif callback is not None:
+        A spinner is spotted after two generations:
+
+        >>> thing.grid = mock.Mock(cells=np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]))
+        >>> thing.evolve(9, 10, callback)
+        >>> thing.cycle_period
+        2
+        >>> thing.grid.cells[1:4, 1:4]
+        array([[0, 1, 0],
+               [0, 1, 0],
+               [0, 1, 0]])
+        >>> callback.call_count
+        2
+
+        Without animation:
+
+        >>> thing.grid = mock.Mock(cells=np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]))
+        >>> thing.evolve(3, 0.001, callback, animate=False)
+        >>> thing.grid.cells[1:4, 1:4]
+        array([[0, 1, 0],
+               [0, 1, 0],
+               [0, 1, 0]])
+        >>> callback.call_count
+        3
+
+        The engine tells the grid how the players' populations changed:
+
+        >>> from kivy_p2life.engines import P2LifeEngine
+        >>> thing.app = mock.Mock(engine=P2LifeEngine())
+        >>> thing.evolve(1, 0.001, animate=False)
+        >>> thing.grid.apply_deltas.call_args
+        call({1: (2, 2), 2: (0, 0)})
+
+        On a worker thread:
+
+        >>> import time
+        >>> def run_clock(func, interval):
+        ...     while func(interval) is not False:
+        ...         time.sleep(interval)
+        >>> Clock.schedule_interval = run_clock
+        >>> thing.app = mock.Mock(engine=None, threaded=True)
+        >>> thing.grid = mock.Mock(cells=np.array([[0, 0, 0, 0, 0], [0, 0, 0, 0, 0], [0, 1, 1, 1, 0], [0, 0, 0, 0, 0], [0, 0, 0, 0, 0]]))
+        >>> thing.evolve(9, 100, callback)
+        >>> thing.grid.cells[1:4, 1:4]
+        array([[0, 1, 0],
+               [0, 1, 0],
+               [0, 1, 0]])
+        >>> callback.call_count
+        4
+
+        If the clock falls behind, generations are computed but not shown:
+
+        >>> def slow_clock(func, interval):
+        ...     while func(interval * 3) is not False:
+        ...         pass
+        >>> Clock.schedule_interval = slow_clock
+        >>> thing.app = None
+        >>> thing.grid = mock.Mock(cells=np.zeros((3, 3), dtype=int))
+        >>> with mock.patch("kivy_p2life.gol.life_step") as life_step:
+        ...     life_step.side_effect = lambda X: X + 1
+        ...     thing.evolve(10, 10, callback)
+        >>> thing.grid.cells[0, 0]
+        10
+        >>> thing.frames_dropped
+        6
+        """
+        engine = self.app.engine if self.app is not None else None
+        boundary = getattr(engine, "boundary", WRAP)
+        if not animate:
+            cells = advance(self.grid.cells, iterations, step=engine)
+            if engine is not None:
+                self.grid.apply_deltas(engine.deltas)
+            self.grid.cells = cells
+            if callback is not None:
                 callback()
+            return
 
-        _update(remaining=iterations)
+        self.cycle_period = None
+        self.frames_dropped = 0
+        frames = self._turn_frames(self.grid.cells, iterations, engine,
+                                   boundary)
+        # Generations are computed on a worker thread, and this (main) thread
+        # just displays them
+        worker = FrameWorker(frames, threaded=self.app is not None and
+                             self.app.threaded)
+        if self.app is not None:
+            # The app stops the turn if the engine has to be reset or closed
+            self.app.stop_turn()
+            self.app.turn_worker = worker
+        worker.start()
+        pacer = FramePacer(speed)
+
+        def _tick(dt):
+            cells = None
+            deltas = {}
+            finished = False
+            for unused in range(pacer.due(dt)):
+                try:
+                    frame = worker.get()
+                except StopIteration:
+                    finished = True
+                    break
+                if frame is None:
+                    # The worker has fallen behind; wait for the next tick
+                    break
+                if cells is not None:
+                    self.frames_dropped += 1
+                pacer.taken += 1
+                cells, frame_deltas, period = frame
+                if period is not None:
+                    self.cycle_period = period
+                if deltas is not None and frame_deltas is not None:
+                    for number, (births, deaths) in frame_deltas.items():
+                        old_births, old_deaths = deltas.get(number, (0, 0))
+                        deltas[number] = (old_births + births,
+                                          old_deaths + deaths)
+                else:
+                    deltas = None
+            if cells is not None:
+                if deltas:
+                    self.grid.apply_deltas(deltas)
+                self.grid.cells = cells
+            if finished:
+                if self.app is not None and self.app.turn_worker is worker:
+                    self.app.turn_worker = self.app.turn_event = None
+                if callback is not None:
+                    callback()
+                return False
+
+        # Show the first generation straight away
+        if _tick(0) is not False:
+            event = Clock.schedule_interval(_tick, 1 / speed)
+            if self.app is not None and self.app.turn_worker is worker:
+                self.app.turn_event = event
+
+    def _turn_frames(self, cells, iterations, engine, boundary):
+        """ Generate the (cells, deltas, cycle period) of each generation to
+        be shown in a turn; this runs on the evolution worker thread """
+        detector = None
+        if boundary != UNBOUNDED:
+            detector = CycleDetector(cells, boundary=boundary)
+        anim = life_animation(cells, step=engine)
+        remaining = iterations
+        while remaining:
+            cells = anim.next()
+            remaining -= 1
+            deltas = engine.deltas if engine is not None else None
+            period = detector and detector.add(cells)
+            if period is not None and remaining:
+                cells = detector.predict(remaining)
+                remaining = 0
+                # The engine didn't count the skipped generations
+                deltas = None
+            yield cells, deltas, period
 
     def end_turn_callback(self):
         """ Finish ending the turn after iterating
@@ -208,7 +381,8 @@ class CustomLayoutMixin(object):
         else:
             ui.had_maximum_score = False
         self.evolve(self.app.iterations_per_turn, speed=self.app.speed,
-                    callback=self.end_turn_callback)
+                    callback=self.end_turn_callback,
+                    animate=self.app.animate)
 
     @property
     def player(self):
@@ -276,6 +450,12 @@ class GameOfLifeApp(App):
 
     iterations_per_turn = NumericProperty()
     speed = NumericProperty
+    engine = ObjectProperty(None)
+    animate = BooleanProperty(True)
+    threaded = BooleanProperty(True)
+    # The worker and clock event of the turn being evolved, if any
+    turn_worker = ObjectProperty(None, allownone=True)
+    turn_event = ObjectProperty(None, allownone=True)
 
     def build_config(self, config):
         config.setdefaults("game", {
@@ -283,11 +463,21 @@ class GameOfLifeApp(App):
             "iterations_per_turn": 15,
             "top_score": 100,
             "minimum_pieces": 3,
+            # 'auto' picks the fastest engine for the grid size at startup
+            "engine": AUTO,
+            # If false, skip straight to the end of each turn
+            "animate": True,
+            # 'wrap', 'dead' (empty beyond the edges) or 'unbounded'
+            "boundary": WRAP,
+            # Evolve on a background thread, so the UI stays responsive
+            "threaded": True,
         })
         config.setdefaults("grid", {
             "rows": 30,
             "cols": 30,
             "cell_size": 15,
+            # 'widgets' or 'texture'; use 'texture' for very big grids
+            "render_mode": "widgets",
         })
         config.setdefaults("input", {
             # 'touch' can be a finger or a mouse, depending on the platform
@@ -316,6 +506,8 @@ class GameOfLifeApp(App):
         self.iterations_per_turn = config.getint("game", "iterations_per_turn")
         self.top_score = config.getint("game", "top_score")
         self.minimum_pieces = config.getint("game", "minimum_pieces")
+        self.animate = config.getboolean("game", "animate")
+        self.threaded = config.getboolean("game", "threaded")
 
         # Root widget
         self.root = Builder.load_file(kv_filename)
@@ -325,6 +517,12 @@ class GameOfLifeApp(App):
         self.root.grid.rows = config.getint("grid", "rows")
         self.root.grid.cols = config.getint("grid", "cols")
         self.root.grid.cell_size = config.getint("grid", "cell_size")
+        self.root.grid.render_mode = config.get("grid", "render_mode")
+
+        # Engine
+        self.engine = create_engine(config.get("game", "engine"),
+                                    self.root.grid.rows, self.root.grid.cols,
+                                    boundary=config.get("game", "boundary"))
 
     def on_start(self):
         self.root.grid.init_cells()
@@ -335,15 +533,47 @@ class GameOfLifeApp(App):
 
         Clock.schedule_once(self.after_start, timeout=1)
 
+    def on_stop(self):
+        self.stop_turn()
+        self.engine.close()
+
     def after_start(self, *args):
         if self.root.shapes:
             for shape in self.root.shapes.children:
                 shape.setup()
 
+    def stop_turn(self):
+        """ Abandon the turn being evolved, if any
+
+        This waits for the worker thread to finish with the engine, so call
+        it before resetting or closing the engine.
+
+        >>> import itertools, mock
+        >>> from kivy_p2life.worker import FrameWorker
+        >>> app = GameOfLifeApp()
+        >>> app.turn_worker = FrameWorker(itertools.count(), maxsize=1)
+        >>> app.turn_worker.start()
+        >>> event = app.turn_event = mock.Mock()
+        >>> app.stop_turn()
+        >>> event.cancel.call_count
+        1
+        >>> app.turn_worker is None
+        True
+        """
+        if self.turn_event is not None:
+            self.turn_event.cancel()
+            self.turn_event = None
+        if self.turn_worker is not None:
+            self.turn_worker.stop()
+            self.turn_worker.join()
+            self.turn_worker = None
+
     def reset_ui(self):
+        self.stop_turn()
         for grid_index, unused in enumerate(self.root.grid.grids):
             self.root.grid.clear_grid(grid_index)
         self.root.unset_winner()
+        self.engine.reset()
         for player_pieces in self.root.grid.player_pieces:
             player_pieces.update_pieces(-player_pieces.pieces)
         self.root.set_turn(Players.WHITE)